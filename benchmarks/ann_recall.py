@@ -0,0 +1,103 @@
+"""
+Compare the IVF index against exact search on the same embeddings.
+
+For each `nprobe` this reports recall@k (the fraction of the exact top k that the index
+also returned) and the mean query latency, so the trade-off can be picked from real numbers.
+
+    python -m benchmarks.ann_recall --store ./vectors
+    python -m benchmarks.ann_recall --synthetic 200000 --dim 768
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from semantic_search.vector_store import VectorStore
+
+
+def synthetic_store(
+    path: str, n: int, dim: int, seed: int = 0, dtype: str | None = None
+) -> VectorStore:
+    """
+    Clustered random vectors; uniformly random ones have no structure for IVF to find,
+    which makes it look worse than it is on real embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 500, 1), dim)).astype(np.float32)
+    labels = rng.integers(len(centers), size=n)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    store = VectorStore(path, dtype=dtype)
+    for start in range(0, n, 10000):
+        stop = min(start + 10000, n)
+        store.add(
+            ids=[str(i) for i in range(start, stop)], embeddings=vectors[start:stop]
+        )
+    return store
+
+
+def run(
+    store: VectorStore,
+    k: int,
+    n_queries: int,
+    nprobes: list[int],
+    n_lists: int | None,
+    seed: int = 0,
+) -> dict[str, object]:
+    rng = np.random.default_rng(seed)
+    live = np.flatnonzero(store.live)
+    vectors = store.vectors()
+    # queries are perturbed copies of stored vectors, like a query near a real section
+    picks = rng.choice(live, size=min(n_queries, len(live)), replace=False)
+    noise = 0.1 * rng.normal(size=(len(picks), vectors.shape[1])).astype(np.float32)
+    queries = np.asarray(vectors[picks]) + noise
+
+    start = time.perf_counter()
+    exact = [set(store.query(q, n_results=k, exact=True)["ids"][0]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    ann = store.build_ann(n_lists=n_lists, save=False)
+    build_s = time.perf_counter() - start
+
+    results = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [
+            set(store.query(q, n_results=k, nprobe=nprobe)["ids"][0]) for q in queries
+        ]
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(found, exact)])
+        results.append({"nprobe": nprobe, "recall": float(recall), "query_ms": ms})
+
+    return {
+        "rows": len(store),
+        "dim": vectors.shape[1],
+        "k": k,
+        "n_lists": ann.n_lists,
+        "build_s": build_s,
+        "exact_query_ms": exact_ms,
+        "ivf": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--store", help="an existing VectorStore directory")
+    parser.add_argument("--synthetic", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            store = VectorStore(args.store)
+        else:
+            store = synthetic_store(tmp, args.synthetic, args.dim)
+        report = run(store, args.k, args.queries, args.nprobe, args.lists)
+    print(json.dumps(report, indent=2))
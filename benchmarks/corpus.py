@@ -0,0 +1,110 @@
+"""
+Generate a synthetic Hugo-style content tree for benchmarks.
+
+Posts get YAML or TOML frontmatter (title, date, tags, draft), and a body with headings,
+paragraphs, nested lists, code blocks and footnotes. The output only depends on the seed,
+so runs are comparable.
+
+    python -m benchmarks.corpus /tmp/corpus --posts 2000
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+WORDS = (
+    "alchemy bacon magic mirror optics experiment manuscript friar oxford natural "
+    "philosophy science method index search embedding vector chunk section heading "
+    "python code function parser token model query result cache memory disk thread "
+    "process queue latency throughput recall ranking the a of and to in is that for"
+).split()
+
+TAGS = ["history", "alchemy", "python", "search", "notes", "books", "math", "web"]
+SECTIONS = ["notes", "posts", "books", "projects"]
+
+
+def sentence(rng: random.Random, n: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(n)]
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(rng: random.Random) -> str:
+    return " ".join(sentence(rng, rng.randint(6, 18)) for _ in range(rng.randint(2, 6)))
+
+
+def body(rng: random.Random, n_sections: int) -> str:
+    parts = [paragraph(rng)]
+    footnotes = []
+    for i in range(n_sections):
+        level = rng.choice([2, 2, 3])
+        parts.append(f"{'#' * level} {sentence(rng, rng.randint(2, 5))[:-1]}")
+        for _ in range(rng.randint(1, 4)):
+            kind = rng.random()
+            if kind < 0.6:
+                text = paragraph(rng)
+                if rng.random() < 0.2:
+                    n = len(footnotes) + 1
+                    text += f"[^{n}]"
+                    footnotes.append(f"[^{n}]: {sentence(rng, 8)}")
+                parts.append(text)
+            elif kind < 0.8:
+                items = []
+                for _ in range(rng.randint(2, 6)):
+                    items.append(f"- {sentence(rng, rng.randint(3, 10))}")
+                    if rng.random() < 0.3:
+                        items.append(f"  - {sentence(rng, rng.randint(3, 8))}")
+                parts.append("\n".join(items))
+            else:
+                lines = [
+                    f"    x_{j} = {rng.choice(WORDS)}({j})" for j in range(rng.randint(3, 15))
+                ]
+                code = "def f():\n" + "\n".join(lines)
+                parts.append(f"```python\n{code}\n```")
+    parts.extend(footnotes)
+    return "\n\n".join(parts) + "\n"
+
+
+def post(rng: random.Random, i: int) -> str:
+    title = sentence(rng, rng.randint(2, 7))[:-1]
+    day = date(2015, 1, 1) + timedelta(days=rng.randint(0, 3650))
+    tags = rng.sample(TAGS, rng.randint(0, 3))
+    draft = rng.random() < 0.1
+    text = body(rng, rng.randint(1, 12))
+    if rng.random() < 0.8:
+        tag_list = ", ".join(tags)
+        fm = (
+            f'---\ntitle: "{title}"\ndate: {day.isoformat()}\n'
+            f"tags: [{tag_list}]\ndraft: {str(draft).lower()}\n---\n"
+        )
+    else:
+        tag_list = ", ".join(f'"{t}"' for t in tags)
+        fm = (
+            f'+++\ntitle = "{title}"\ndate = {day.isoformat()}\n'
+            f"tags = [{tag_list}]\ndraft = {str(draft).lower()}\n+++\n"
+        )
+    return fm + "\n" + text
+
+
+def generate(root: str | Path, n_posts: int, seed: int = 0) -> list[Path]:
+    """
+    Write `n_posts` posts under `root` and return their paths.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    paths = []
+    for i in range(n_posts):
+        path = root / rng.choice(SECTIONS) / f"post-{i:06d}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(post(rng, i), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root")
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"wrote {len(generate(args.root, args.posts, args.seed))} posts")
@@ -0,0 +1,117 @@
+"""
+Recall against the number of stored dimensions.
+
+Reduces the vectors of an existing (unreduced) store to each dimension with PCA and with
+truncation, and reports recall@k against exact search over the full vectors, along with
+the bytes per row and the scoring time. Queries are either real ones, embedded with the
+model, or perturbed copies of stored sections.
+
+    python -m benchmarks.dimension_recall --store ./vectors --queries queries.txt
+    python -m benchmarks.dimension_recall --synthetic 50000 --dim 768
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from semantic_search.reduction import Projection
+from semantic_search.vector_store import VectorStore, normalize
+
+from .ann_recall import synthetic_store
+
+
+def exact_top(
+    queries: np.ndarray, vectors: np.ndarray, k: int
+) -> tuple[list[set[int]], float]:
+    start = time.perf_counter()
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return [set(row.tolist()) for row in top], ms
+
+
+def run(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    dims: list[int],
+    methods: list[str],
+) -> dict[str, object]:
+    full_dim = vectors.shape[1]
+    exact, full_ms = exact_top(queries, vectors, k)
+    results = []
+    for method in methods:
+        for dim in dims:
+            if dim >= full_dim:
+                continue
+            start = time.perf_counter()
+            if method == "pca":
+                projection = Projection.pca(vectors, dim)
+            else:
+                projection = Projection.truncate(full_dim, dim)
+            reduced = projection.apply(vectors)
+            fit_s = time.perf_counter() - start
+            found, ms = exact_top(projection.apply(queries), reduced, k)
+            recall = np.mean([len(f & e) / k for f, e in zip(found, exact)])
+            results.append(
+                {
+                    "method": method,
+                    "dim": dim,
+                    "recall": float(recall),
+                    "bytes_per_row": dim * 4,
+                    "query_ms": ms,
+                    "fit_s": fit_s,
+                }
+            )
+    return {
+        "rows": len(vectors),
+        "dim": full_dim,
+        "k": k,
+        "full_query_ms": full_ms,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--store", help="an existing, unreduced VectorStore directory")
+    parser.add_argument("--queries", help="a file of queries, one per line")
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--synthetic", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument(
+        "--dims", type=int, nargs="+", default=[32, 64, 128, 256, 384, 512]
+    )
+    parser.add_argument(
+        "--methods", nargs="+", choices=["pca", "truncate"], default=["pca", "truncate"]
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            store = VectorStore(args.store)
+            if store.projection is not None:
+                raise SystemExit(f"{args.store} is already reduced")
+        else:
+            store = synthetic_store(tmp, args.synthetic, args.dim)
+        vectors = np.asarray(store.vectors()[store.live])
+
+        if args.queries:
+            from sentence_transformers import SentenceTransformer
+
+            with open(args.queries, encoding="utf-8") as f:
+                texts = [line.strip() for line in f if line.strip()]
+            queries = normalize(SentenceTransformer(args.model).encode(texts))
+        else:
+            rng = np.random.default_rng(0)
+            picks = rng.choice(len(vectors), min(args.n_queries, len(vectors)), False)
+            noise = 0.1 * rng.normal(size=(len(picks), vectors.shape[1]))
+            queries = normalize(vectors[picks] + noise.astype(np.float32))
+
+        report = run(vectors, queries, args.k, args.dims, args.methods)
+    print(json.dumps(report, indent=2))
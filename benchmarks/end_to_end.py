@@ -0,0 +1,194 @@
+"""
+Time every stage of indexing and searching, at several corpus sizes.
+
+For each size a synthetic Hugo corpus is generated (see `corpus.py`) and taken through:
+- read: reading the files
+- frontmatter: `frontmatter.loads`
+- markdown: the mistune AST
+- sections: `extract_sections`
+- embed: embedding the sections
+- index: adding them to a `VectorStore`
+- ann_build: training the IVF index
+- query: exact, IVF and BM25 searches, per query
+
+Embedding uses a stand-in model by default: words hashed into a fixed number of
+dimensions. It makes no sense as a model, but its cost is predictable and needs no
+download, so the other stages can be compared between runs. `--model` uses a real
+sentence-transformers model instead.
+
+The report is JSON, so runs can be saved and compared:
+
+    python -m benchmarks.end_to_end --sizes 100 1000 5000 > bench-$(git rev-parse --short HEAD).json
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any
+
+import mistune
+import numpy as np
+
+import frontmatter
+from postchunker import extract_sections, section_text
+from postindexer import iter_posts, parse_markdown
+from semantic_search.lexical import tokenize
+from semantic_search.vector_store import VectorStore
+
+from .corpus import WORDS, generate
+
+
+class HashingModel(object):
+    """
+    A stand-in for a SentenceTransformer: a normalized bag of hashed words. crc32
+    rather than `hash`, which changes between processes.
+    """
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    def encode(
+        self, texts: list[str], batch_size: int = 32, **kwargs: Any
+    ) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in tokenize(text):
+                embeddings[i, zlib.crc32(token.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+
+class Timer(object):
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+
+    def __call__(self, name: str) -> "Timer":
+        self.name = name
+        return self
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stages[self.name] = time.perf_counter() - self.start
+
+
+def run_size(
+    root: Path, store_dir: Path, n_posts: int, model: Any, n_queries: int, seed: int
+) -> dict[str, Any]:
+    generate(root, n_posts, seed)
+    paths = list(iter_posts(root))
+    timer = Timer()
+
+    with timer("read"):
+        data = [path.read_bytes() for path in paths]
+    with timer("frontmatter"):
+        posts = [frontmatter.loads(raw.decode("utf-8")) for raw in data]
+    with timer("markdown"):
+        trees = [parse_markdown(post.content) for post in posts]
+    with timer("sections"):
+        sections = [
+            extract_sections(nodes, headings=[str(post.get("title", ""))])
+            for post, nodes in zip(posts, trees)
+        ]
+
+    ids, texts, metadatas = [], [], []
+    for path, post_sections in zip(paths, sections):
+        rel = path.relative_to(root).as_posix()
+        for i, section in enumerate(post_sections):
+            ids.append(f"{rel}#{i}")
+            texts.append(section_text(section))
+            metadatas.append({"path": rel, "chunk": i})
+
+    with timer("embed"):
+        embeddings = model.encode(texts, batch_size=32)
+    store = VectorStore(store_dir)
+    with timer("index"):
+        for start in range(0, len(ids), 256):
+            stop = start + 256
+            store.add(
+                ids[start:stop],
+                embeddings[start:stop],
+                texts[start:stop],
+                metadatas[start:stop],
+            )
+    with timer("ann_build"):
+        store.build_ann()
+
+    rng = np.random.default_rng(seed)
+    queries = [" ".join(rng.choice(WORDS, size=4)) for _ in range(n_queries)]
+    query = {}
+    for name, search in [
+        ("embed", lambda q: model.encode([q])),
+        ("exact", lambda q: store.query(model.encode([q]), n_results=10, exact=True)),
+        ("ivf", lambda q: store.query(model.encode([q]), n_results=10)),
+        ("lexical", lambda q: store.lexical.search(q, store.live, k=10)),
+    ]:
+        times = []
+        for q in queries:
+            start = time.perf_counter()
+            search(q)
+            times.append(time.perf_counter() - start)
+        ms = np.array(times) * 1000
+        query[name] = {
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+        }
+
+    return {
+        "posts": len(paths),
+        "bytes": sum(len(raw) for raw in data),
+        "sections": len(ids),
+        "stages_s": timer.stages,
+        "per_post_us": {
+            name: seconds * 1e6 / len(paths) for name, seconds in timer.stages.items()
+        },
+        "query": query,
+    }
+
+
+def run(
+    sizes: list[int], model: Any, model_name: str, n_queries: int = 100, seed: int = 0
+) -> dict[str, Any]:
+    runs = []
+    for n_posts in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            root, store_dir = Path(tmp) / "content", Path(tmp) / "vectors"
+            runs.append(run_size(root, store_dir, n_posts, model, n_queries, seed))
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "mistune": mistune.__version__,
+            "model": model_name,
+        },
+        "seed": seed,
+        "runs": runs,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--model", help="a sentence-transformers model, rather than the stand-in"
+    )
+    args = parser.parse_args()
+
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+
+        model: Any = SentenceTransformer(args.model)
+    else:
+        model = HashingModel()
+    report = run(args.sizes, model, args.model or "hashing", args.queries, args.seed)
+    print(json.dumps(report, indent=2))
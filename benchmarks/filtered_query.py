@@ -0,0 +1,112 @@
+"""
+Filtered search: the cost of a `where` filter at different selectivities, and what
+filtering the top k afterwards would have lost.
+
+Rows of a synthetic store get a tag that a given fraction of them share. For each
+fraction this reports the mean latency of an exact query with and without the filter,
+and how many of the filtered top k a post-filter (taking the unfiltered top
+`oversample * k` and dropping the rows that don't match) would have found.
+
+    python -m benchmarks.filtered_query --synthetic 200000 --dim 384
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from semantic_search.vector_store import FILTER_GATHER, VectorStore
+
+
+def tagged_store(path: str, n: int, dim: int, fractions: list[float], seed: int = 0):
+    rng = np.random.default_rng(seed)
+    store = VectorStore(path)
+    draws = rng.random(n)
+    for start in range(0, n, 10000):
+        stop = min(start + 10000, n)
+        metadatas = [
+            {"tags": [f"f{f}" for f in fractions if draws[i] < f]}
+            for i in range(start, stop)
+        ]
+        vectors = rng.normal(size=(stop - start, dim)).astype(np.float32)
+        store.add(
+            ids=[str(i) for i in range(start, stop)],
+            embeddings=vectors,
+            metadatas=metadatas,
+        )
+    return store
+
+
+def mean_ms(fn, queries: np.ndarray) -> float:
+    fn(queries[:1])  # warm up
+    start = time.perf_counter()
+    for query in queries:
+        fn(query[np.newaxis])
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run(
+    store: VectorStore,
+    fractions: list[float],
+    k: int = 10,
+    oversample: int = 10,
+    n_queries: int = 50,
+    seed: int = 0,
+) -> dict[str, object]:
+    rng = np.random.default_rng(seed)
+    assert store.dim is not None
+    queries = rng.normal(size=(n_queries, store.dim)).astype(np.float32)
+
+    results = []
+    for fraction in fractions:
+        where = {"tags": f"f{fraction}"}
+        matching = int(np.count_nonzero(store.matching(where)))
+        found = []
+        for query in queries:
+            filtered = store.query(query, n_results=k, exact=True, where=where)
+            unfiltered = store.query(query, n_results=k * oversample, exact=True)
+            post = [id for id in unfiltered["ids"][0] if id in set(filtered["ids"][0])]
+            found.append(len(post) / max(len(filtered["ids"][0]), 1))
+        results.append(
+            {
+                "fraction": fraction,
+                "matching": matching,
+                "path": "gather" if matching <= FILTER_GATHER * store.count else "scan",
+                "filtered_ms": mean_ms(
+                    lambda q: store.query(q, n_results=k, exact=True, where=where),
+                    queries,
+                ),
+                "post_filter_recall": float(np.mean(found)),
+            }
+        )
+
+    return {
+        "rows": len(store),
+        "dim": store.dim,
+        "k": k,
+        "oversample": oversample,
+        "unfiltered_ms": mean_ms(
+            lambda q: store.query(q, n_results=k, exact=True), queries
+        ),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--synthetic", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument(
+        "--fractions", type=float, nargs="+", default=[0.001, 0.01, 0.1, 0.5]
+    )
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = tagged_store(tmp, args.synthetic, args.dim, args.fractions)
+        report = run(store, args.fractions, args.k, args.oversample, args.queries)
+    print(json.dumps(report, indent=2))
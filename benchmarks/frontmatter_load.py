@@ -0,0 +1,71 @@
+"""
+Per-file cost of loading frontmatter.
+
+Times, for every post in a content directory:
+- read: reading the bytes
+- split: `frontmatter.split`, which finds the frontmatter without parsing it
+- load: `frontmatter.load` plus reading the title, so including the YAML/TOML loader
+- load_content: `frontmatter.load` and the content only, which never runs the loader
+- scan: `frontmatter.scan_header` plus reading the title, without the content
+
+    python -m benchmarks.frontmatter_load ~/projects/zalgorithm/content
+    python -m benchmarks.frontmatter_load --synthetic 3000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import frontmatter
+from postindexer import iter_posts
+
+from .corpus import generate
+
+
+def per_file_us(paths: list[Path], fn: Callable[[Path], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in paths:
+            fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6 / len(paths)
+
+
+def run(root: Path, repeat: int = 3) -> dict[str, object]:
+    paths = list(iter_posts(root))
+    if not paths:
+        raise SystemExit(f"No posts found under {root}")
+    return {
+        "backends": frontmatter.backends(),
+        "files": len(paths),
+        "bytes": sum(p.stat().st_size for p in paths),
+        "read_us": per_file_us(paths, lambda p: p.read_bytes(), repeat),
+        "split_us": per_file_us(paths, lambda p: frontmatter.split(p.read_bytes()), repeat),
+        "load_us": per_file_us(
+            paths, lambda p: frontmatter.load(p).get("title"), repeat
+        ),
+        "load_content_us": per_file_us(
+            paths, lambda p: frontmatter.load(p).content, repeat
+        ),
+        "scan_us": per_file_us(
+            paths, lambda p: frontmatter.scan_header(p).get("title"), repeat
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root", nargs="?")
+    parser.add_argument("--synthetic", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.root) if args.root else Path(tmp)
+        if not args.root:
+            generate(root, args.synthetic)
+        print(json.dumps(run(root, args.repeat), indent=2))
@@ -0,0 +1,85 @@
+"""
+Memory against recall for the quantized storage modes.
+
+The same vectors are stored as float32, float16 and int8, and each store is searched
+exhaustively with and without a float32 rerank of the top candidates. Recall@k is against
+the float32 results; `resident_bytes` is the size of the array a query scans, which is
+what has to stay in memory to avoid reading from disk.
+
+    python -m benchmarks.quantization --synthetic 100000 --dim 768
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from semantic_search.vector_store import DTYPES, VectorStore
+
+from .ann_recall import synthetic_store
+
+
+def search(
+    store: VectorStore, queries: np.ndarray, k: int, rerank: int
+) -> tuple[list[set[str]], float]:
+    start = time.perf_counter()
+    found = [
+        set(store.query(q, n_results=k, exact=True, rerank=rerank)["ids"][0])
+        for q in queries
+    ]
+    return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run(
+    root: str,
+    n: int,
+    dim: int,
+    k: int,
+    n_queries: int,
+    reranks: list[int],
+    seed: int = 0,
+) -> dict[str, object]:
+    stores = {
+        dtype: synthetic_store(os.path.join(root, dtype), n, dim, seed, dtype)
+        for dtype in DTYPES
+    }
+    rng = np.random.default_rng(seed)
+    vectors = stores["float32"].vectors()
+    picks = rng.choice(n, size=min(n_queries, n), replace=False)
+    noise = 0.1 * rng.normal(size=(len(picks), dim)).astype(np.float32)
+    queries = np.asarray(vectors[picks]) + noise
+    exact, _ = search(stores["float32"], queries, k, 0)
+
+    results = []
+    for dtype, store in stores.items():
+        for rerank in [0] + (reranks if dtype != "float32" else []):
+            found, ms = search(store, queries, k, rerank)
+            recall = np.mean([len(a & e) / len(e) for a, e in zip(found, exact)])
+            results.append(
+                {
+                    "dtype": dtype,
+                    "rerank": rerank,
+                    "resident_bytes": store.nbytes(),
+                    "bytes_per_row": store.nbytes() / len(store),
+                    "recall": float(recall),
+                    "query_ms": ms,
+                }
+            )
+    return {"rows": n, "dim": dim, "k": k, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--synthetic", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[20, 50, 100])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = run(tmp, args.synthetic, args.dim, args.k, args.queries, args.rerank)
+    print(json.dumps(report, indent=2))
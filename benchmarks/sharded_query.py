@@ -0,0 +1,88 @@
+"""
+Exact-search throughput by number of shards.
+
+Queries are run in batches against a synthetic store, scored in the calling process
+("shards": 0) and then by a `ShardedScorer` with each number of worker processes. The
+first batch for each count is discarded, so the report doesn't include starting the
+pool.
+
+    python -m benchmarks.sharded_query --synthetic 1000000 --dim 384 --shards 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from semantic_search.shards import ShardedScorer
+from semantic_search.vector_store import VectorStore
+
+from .ann_recall import synthetic_store
+
+
+def queries_per_second(
+    store: VectorStore, queries: np.ndarray, k: int, batch_size: int
+) -> float:
+    store.query(queries[:batch_size], n_results=k, exact=True)  # warm up
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        store.query(queries[i : i + batch_size], n_results=k, exact=True)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def run(
+    store: VectorStore,
+    shards: list[int],
+    k: int = 10,
+    n_queries: int = 256,
+    batch_size: int = 16,
+    seed: int = 0,
+) -> dict[str, object]:
+    rng = np.random.default_rng(seed)
+    assert store.dim is not None
+    queries = rng.normal(size=(n_queries, store.dim)).astype(np.float32)
+
+    store.scorer = None
+    results = [{"shards": 0, "qps": queries_per_second(store, queries, k, batch_size)}]
+    for n in shards:
+        store.scorer = ShardedScorer(n, min_rows=0)
+        try:
+            qps = queries_per_second(store, queries, k, batch_size)
+        finally:
+            store.scorer.close()
+        results.append({"shards": n, "qps": qps})
+    store.scorer = None
+
+    return {
+        "rows": len(store),
+        "dim": store.dim,
+        "dtype": store.dtype,
+        "cores": os.cpu_count(),
+        "k": k,
+        "batch_size": batch_size,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--store", help="an existing store directory")
+    parser.add_argument("--synthetic", type=int, default=500000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.store:
+            store = VectorStore(args.store)
+        else:
+            store = synthetic_store(tmp, args.synthetic, args.dim, dtype=args.dtype)
+        report = run(store, args.shards, args.k, args.queries, args.batch_size)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,95 @@
+"""
+What importing each package costs, and how long the command line takes to start.
+
+Every measurement runs in a fresh interpreter. Imports are timed with
+`python -X importtime`, which gives the cumulative time of each import; the report has
+the total for the package and the modules that took the longest, so a heavy dependency
+that creeps back into an import path shows up by name.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modules semantic_search.vector_store --top 5
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Any
+
+MODULES = [
+    "semantic_search",
+    "semantic_search.cli",
+    "semantic_search.vector_store",
+    "frontmatter",
+    "postchunker",
+    "postindexer",
+]
+
+
+def import_time(module: str, top: int = 10) -> dict[str, Any]:
+    """
+    The cumulative import time of `module`, and the heaviest imports under it, in ms.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # import time: self [us] | cumulative | imported package
+    imports: list[tuple[str, int]] = []
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            us = int(cumulative)
+        except ValueError:  # the header line
+            continue
+        name = name.strip()
+        imports.append((name, us))
+        if name == module:
+            total = us
+    heaviest = sorted(imports, key=lambda item: item[1], reverse=True)
+    return {
+        "import_ms": total / 1000,
+        "modules": len(imports),
+        "heaviest": [
+            {"module": name, "ms": us / 1000}
+            for name, us in heaviest
+            if name != module
+        ][:top],
+    }
+
+
+def wall_time(args: list[str], repeat: int = 5) -> float:
+    """
+    The best of `repeat` runs of `python args...`, in ms.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(modules: list[str], top: int = 10, repeat: int = 5) -> dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "interpreter_ms": wall_time(["-c", "pass"], repeat),
+        "cli_help_ms": wall_time(["-m", "semantic_search", "--help"], repeat),
+        "imports": {module: import_time(module, top) for module in modules},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.modules, args.top, args.repeat), indent=2))
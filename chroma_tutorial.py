@@ -1,6 +1,6 @@
 import chromadb
-import uuid
 from chromadb.utils import embedding_functions
+from semantic_search.writer import BulkWriter, Chunk
 
 sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
     model_name="all-mpnet-base-v2"
@@ -18,13 +18,16 @@ collection = client.get_or_create_collection(
 with open("policies.txt", "r", encoding="utf-8") as f:
     policies: list[str] = f.read().splitlines()
 
-# add the policies to the collection with the `collection.add` method
-# each record in the collection needs a unique id
-# Note: this only needs to be run once
-collection.add(
-    ids=[str(uuid.uuid4()) for _ in policies],
-    documents=policies,
-    metadatas=[{"line": line} for line in range(len(policies))],
+# add the policies to the collection
+# each record in the collection needs a unique id; BulkWriter uses "policies.txt#<line>"
+# and skips lines that are already stored with the same text, so re-running this doesn't
+# duplicate anything
+writer = BulkWriter(collection, batch_size=256)
+print(
+    writer.write(
+        Chunk("policies.txt", line, policy, {"line": line})
+        for line, policy in enumerate(policies)
+    )
 )
 
 records = collection.peek(1)
@@ -12,19 +12,45 @@ Alterations:
 
 import io
 import pathlib
+import re
 from os import PathLike
-from typing import Iterable, TextIO
+from typing import Iterable, Iterator, TextIO
 
 from .default_handlers import TOMLHandler, YAMLHandler, BaseHandler
 from .util import can_open, is_readable, is_writable, u
-from .post import Post
-
-__all__ = ["parse", "load", "loads", "dump", "dumps", "Post"]
+from .post import Post, LazyPost
+from .bulk import iter_files, load_many
+
+__all__ = [
+    "parse",
+    "split",
+    "load",
+    "loads",
+    "scan_header",
+    "scan_headers",
+    "iter_files",
+    "load_many",
+    "dump",
+    "dumps",
+    "Post",
+    "LazyPost",
+    "backends",
+]
 
 # Calls the class constructor `Handler()` for each `Handler`
 handlers = [Handler() for Handler in [YAMLHandler, TOMLHandler]]
 
 
+def backends() -> dict[str, str]:
+    """
+    Which implementation each of the default handlers is using:
+
+    >>> frontmatter.backends()
+    {'YAMLHandler': 'libyaml+flat', 'TOMLHandler': 'tomllib'}
+    """
+    return {type(handler).__name__: handler.backend for handler in handlers}
+
+
 def detect_format(text: str, handlers: Iterable[BaseHandler]) -> BaseHandler | None:
     """
     Figure out which handler to use, based on metadata. Allows `load` to be called without
@@ -36,6 +62,48 @@ def detect_format(text: str, handlers: Iterable[BaseHandler]) -> BaseHandler | N
     return None
 
 
+_non_space = re.compile(r"\S")
+
+
+def split(
+    text: str | bytes,
+    encoding: str = "utf-8",
+    handler: BaseHandler | None = None,
+) -> tuple[BaseHandler | None, str | None, str]:
+    """
+    Split text into `(handler, frontmatter, content)` without parsing the frontmatter.
+    `frontmatter` and `handler` are None if the text doesn't have any.
+
+    This is the single pass that `parse` and `loads` are built on: the text is decoded
+    once, the format is detected from the opening line only, and the content is sliced
+    out once.
+    """
+    text = u(text, encoding)
+    # the offset of the first non-whitespace character, rather than a stripped copy
+    first = _non_space.search(text)
+    if first is None:
+        return handler, None, ""
+    start = first.start()
+    if start and text[start - 1] != "\n":
+        # the boundary regexes only match at the start of a line
+        text, start = text[start:], 0
+
+    if handler is None:
+        for candidate in handlers:
+            if candidate.detect_at(text, start):
+                handler = candidate
+                break
+        else:
+            return None, None, text[start:].rstrip()
+
+    bounds = handler.find(text, start)
+    if bounds is None:
+        return handler, None, text[start:].rstrip()
+
+    fm_start, fm_end, content_start = bounds
+    return handler, text[fm_start:fm_end], text[content_start:].strip()
+
+
 def parse(
     text: str,
     encoding: str = "utf-8",
@@ -46,23 +114,26 @@ def parse(
     Parse text with frontmatter, return metadata and content.
     Pass in optional metadata default values.
     """
-    text = u(text, encoding).strip()
-    metadata = defaults.copy()
+    _, metadata, content = _parse(text, encoding, handler, defaults)
+    return metadata, content
 
-    handler = handler or detect_format(text, handlers)
-    if handler is None:
-        return metadata, text
 
-    try:
-        fm, content = handler.split(text)
-    except ValueError:
-        return metadata, text
+def _parse(
+    text: str | bytes,
+    encoding: str,
+    handler: BaseHandler | None,
+    defaults: dict[str, object],
+) -> tuple[BaseHandler | None, dict[str, object], str]:
+    metadata = defaults.copy()
+    handler, fm, content = split(text, encoding, handler)
+    if handler is None or fm is None:
+        return handler, metadata, content
 
     fm_data = handler.load(fm)
     if isinstance(fm_data, dict):
         metadata.update(fm_data)
 
-    return metadata, content.strip()
+    return handler, metadata, content
 
 
 def check(fd: TextIO | PathLike[str] | str, encoding: str = "utf-8") -> bool:
@@ -99,18 +170,19 @@ def load(
 ) -> Post:
     """
     Load and parse a file-like object or filename.
-    Returns a Post object
+    Returns a Post object, whose frontmatter is parsed when its metadata is first used
+    (see `loads`).
     """
     if is_readable(fd):
         text = fd.read()
     elif can_open(fd):
-        with open(fd, "r", encoding=encoding) as f:
+        # bytes, decoded once in `split`
+        with open(fd, "rb") as f:
             text = f.read()
 
     else:
         raise ValueError(f"Cannot open filename using type {type(fd)}")
 
-    handler = handler or detect_format(text, handlers)
     post = loads(text, encoding, handler, **defaults)
     return post
 
@@ -122,12 +194,98 @@ def loads(
     **defaults: object,
 ) -> Post:
     """
-    Parse text (binary or unicode) and return a Post object.
+    Parse text (binary or unicode) and return a Post object. The text is only split
+    here; the YAML or TOML loader runs the first time the Post's metadata is used.
     """
-    text = u(text, encoding)
-    handler = handler or detect_format(text, handlers)
-    metadata, content = parse(text, encoding, handler, **defaults)
-    return Post(content, handler, **metadata)
+    handler, fm, content = split(text, encoding, handler)
+    if handler is None or fm is None:
+        return Post(content, handler, **defaults)
+    return Post._unparsed(content, handler, fm, defaults)
+
+
+# how much of a file to read at a time while looking for the end of the frontmatter
+HEADER_BLOCK = 4096
+# give up on reading only the header past this, and fall back to reading the whole file
+MAX_HEADER = 1024 * 1024
+
+
+def _header(
+    text: str, handler: BaseHandler | None, complete: bool
+) -> tuple[BaseHandler | None, str | None, int] | None:
+    """
+    Find the frontmatter in the beginning of a file. Returns `(handler, frontmatter,
+    content_start)`, or None if more of the file is needed to tell.
+    """
+    first = _non_space.search(text)
+    if first is None:
+        return (handler, None, 0) if complete else None
+    start = first.start()
+    head = text[start:]  # only ever a few KB
+
+    if handler is None:
+        handler = detect_format(head, handlers)
+    if handler is None or not handler.detect(head):
+        # no frontmatter, the content is the whole file
+        return handler, None, 0
+
+    bounds = handler.find(head)
+    if bounds is not None:
+        fm_start, fm_end, content_start = bounds
+        return handler, head[fm_start:fm_end], start + content_start
+    if complete:
+        # an opening boundary without a closing one
+        return handler, None, 0
+    return None
+
+
+def scan_header(
+    path: str | PathLike[str],
+    encoding: str = "utf-8",
+    handler: BaseHandler | None = None,
+    **defaults: object,
+) -> LazyPost:
+    """
+    Read a file only as far as the end of its frontmatter, and return a LazyPost. The
+    frontmatter isn't parsed until a metadata key is accessed, and the content isn't
+    read until it's used.
+    """
+    data = b""
+    with open(path, "rb") as f:
+        while len(data) < MAX_HEADER:
+            block = f.read(HEADER_BLOCK)
+            data += block
+            if block:
+                # only decode whole lines, so a multibyte character is never cut in half
+                text = data[: data.rfind(b"\n") + 1].decode(encoding)
+            else:
+                text = data.decode(encoding)
+
+            header = _header(text, handler, complete=not block)
+            if header is not None:
+                found, fm, content_start = header
+                offset = len(text[:content_start].encode(encoding))
+                return LazyPost(path, found, fm, offset, encoding, **defaults)
+
+        # the frontmatter is huge (or it's not frontmatter), do it the slow way
+        data += f.read()
+    found, fm, content = split(data, encoding, handler)
+    post = LazyPost(path, found, fm, 0, encoding, **defaults)
+    post.content = content
+    return post
+
+
+def scan_headers(
+    paths: Iterable[str | PathLike[str]],
+    encoding: str = "utf-8",
+    **defaults: object,
+) -> Iterator[LazyPost]:
+    """
+    `scan_header` for each path.
+
+    >>> titles = {post.path: post["title"] for post in frontmatter.scan_headers(paths)}
+    """
+    for path in paths:
+        yield scan_header(path, encoding, **defaults)
 
 
 def dump(
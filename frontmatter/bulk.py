@@ -0,0 +1,108 @@
+"""
+Load every post under a directory.
+
+The walk uses `os.scandir` and skips hidden directories (`.git`, `.obsidian`, ...) without
+descending into them. File reads are handed to a thread pool a few files ahead of the
+parser, so on a slow or network-mounted disk the reads overlap with each other and with
+the parsing, instead of happening one at a time.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .default_handlers import BaseHandler
+from .post import Post
+
+__all__ = ["iter_files", "load_many"]
+
+DEFAULT_PATTERNS = ("*.md", "*.markdown")
+
+
+def iter_files(
+    root: str | os.PathLike[str], patterns: Iterable[str] = DEFAULT_PATTERNS
+) -> Iterator[Path]:
+    """
+    Yield the files under `root` whose names match one of `patterns` (case-insensitive),
+    skipping hidden files and directories. Entries are visited in sorted order, so the
+    output is stable.
+    """
+    patterns = [pattern.lower() for pattern in patterns]
+    stack = [os.fspath(root)]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                name = entry.name.lower()
+                if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+                    yield Path(entry.path)
+        # reversed, so they come off the stack in sorted order
+        stack.extend(reversed(subdirs))
+
+
+def _read(path: Path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_many(
+    root: str | os.PathLike[str],
+    patterns: Iterable[str] = DEFAULT_PATTERNS,
+    workers: int = 8,
+    prefetch: int | None = None,
+    encoding: str = "utf-8",
+    handler: BaseHandler | None = None,
+    **defaults: object,
+) -> Iterator[tuple[Path, Post | None, Exception | None]]:
+    """
+    Yield `(path, post, error)` for each file under `root`, in `iter_files` order. A file
+    that can't be read or parsed gives `(path, None, error)` rather than stopping the
+    walk.
+
+    >>> for path, post, error in frontmatter.load_many(postspath):
+    ...     if error is not None:
+    ...         print(f"skipping {path}: {error}")
+
+    Up to `prefetch` files (default `4 * workers`) are read ahead of the one being
+    parsed.
+    """
+    # imported here, the package's __init__ imports this module
+    from . import loads
+
+    prefetch = prefetch or workers * 4
+    pending: deque[tuple[Path, Future[bytes]]] = deque()
+
+    def finish(
+        path: Path, future: Future[bytes]
+    ) -> tuple[Path, Post | None, Exception | None]:
+        try:
+            # loads decodes bytes itself, it's typed as str for the common case
+            post = loads(future.result(), encoding, handler, **defaults)  # type: ignore[arg-type]
+            post.metadata  # parsed here, so bad frontmatter is this file's error
+        except Exception as e:
+            return path, None, e
+        return path, post, None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for path in iter_files(root, patterns):
+                pending.append((path, executor.submit(_read, path)))
+                if len(pending) >= prefetch:
+                    yield finish(*pending.popleft())
+            while pending:
+                yield finish(*pending.popleft())
+        finally:
+            for _, future in pending:
+                future.cancel()
@@ -7,6 +7,10 @@ A handler needs to do four things:
 - split the frontmatter from the content, returning both as a tuple
 - parse the frontmatter into a dictionary
 - export a dictionary back into text
+
+The libraries that do the parsing can be swapped: `YAMLHandler` takes a PyYAML loader and
+dumper, `TOMLHandler` a `loads` function. Each handler's `backend` says what it's using,
+because PyYAML without libyaml is about ten times slower and falls back silently.
 """
 
 # To deal with forward referencing, but I'm not sure I've got this sorted out
@@ -14,14 +18,16 @@ A handler needs to do four things:
 # runtime. The conflict is that Post uses the BaseHandler type and BaseHandler uses the Post type
 from __future__ import annotations
 
+import os
 import re
 import tomllib as toml  # tomllib is in the Python standard library as of 3.11
 import tomli_w  # used because tomllib doesn't have a dump method
 import yaml
 from .util import u
 from .post import Post
+from .flat_yaml import load_flat
 
-from typing import Any, Type
+from typing import Any, Callable, Type
 
 # For my case this could probably be simplified to
 # from yaml import CSafeDumper as SafeDumper
@@ -34,10 +40,14 @@ SafeLoader: Type[yaml.CSafeLoader] | Type[yaml.SafeLoader]
 try:
     from yaml import CSafeDumper as SafeDumper
     from yaml import CSafeLoader as SafeLoader
+
+    LIBYAML = True
 except ImportError:
     from yaml import SafeDumper
     from yaml import SafeLoader
 
+    LIBYAML = False
+
 __all__ = ["BaseHandler", "YAMLHandler", "TOMLHandler"]
 
 
@@ -75,6 +85,13 @@ class BaseHandler:
                 )
             )
 
+    @property
+    def backend(self) -> str:
+        """
+        The implementation doing the parsing.
+        """
+        return type(self).__name__
+
     def detect(self, text: str) -> bool:
         """
         Detect if the handler can parse the given text.
@@ -84,13 +101,38 @@ class BaseHandler:
             return True
         return False
 
+    def detect_at(self, text: str, pos: int) -> bool:
+        """
+        `detect` for text that starts at `pos`, without slicing it.
+        """
+        assert self.FM_BOUNDARY is not None
+        return self.FM_BOUNDARY.match(text, pos) is not None
+
     def split(self, text: str) -> tuple[str, str]:
         """
         Split text into frontmatter and content.
         """
+        bounds = self.find(text)
+        if bounds is None:
+            raise ValueError("No frontmatter found")
+        fm_start, fm_end, content_start = bounds
+        return text[fm_start:fm_end], text[content_start:]
+
+    def find(self, text: str, pos: int = 0) -> tuple[int, int, int] | None:
+        """
+        Find the frontmatter in text that starts with an opening boundary at `pos`.
+        Returns the offsets `(fm_start, fm_end, content_start)`, so the caller can slice
+        out only what it needs. Only the opening line and the frontmatter itself are
+        scanned, never the rest of the content.
+        """
         assert self.FM_BOUNDARY is not None
-        _, fm, content = self.FM_BOUNDARY.split(text, 2)
-        return fm, content
+        opening = self.FM_BOUNDARY.match(text, pos)
+        if opening is None:
+            return None
+        closing = self.FM_BOUNDARY.search(text, opening.end())
+        if closing is None:
+            return None
+        return opening.end(), closing.start(), closing.end()
 
     def load(self, fm: str) -> dict[str, Any]:
         """
@@ -129,18 +171,62 @@ class YAMLHandler(BaseHandler):
     FM_BOUNDARY = re.compile(r"^-{3,}\s*$", re.MULTILINE)
     START_DELIMITER = END_DELIMITER = "---"
 
+    def __init__(
+        self,
+        fm_boundary: re.Pattern[str] | None = None,
+        start_delimiter: str | None = None,
+        end_delimiter: str | None = None,
+        loader: Any = None,
+        dumper: Any = None,
+        flat: bool = True,
+        require_libyaml: bool | None = None,
+    ):
+        """
+        `loader` and `dumper` default to PyYAML's safe ones, the libyaml versions if
+        they're available. With `require_libyaml` (or the FRONTMATTER_REQUIRE_LIBYAML
+        environment variable set) a missing libyaml is an ImportError rather than a slow
+        fallback.
+
+        With `flat`, frontmatter that's only `key: value` lines is parsed without PyYAML
+        (see `flat_yaml`), giving the same result.
+        """
+        super().__init__(fm_boundary, start_delimiter, end_delimiter)
+        if require_libyaml is None:
+            require_libyaml = os.environ.get("FRONTMATTER_REQUIRE_LIBYAML", "0") != "0"
+        if require_libyaml and not LIBYAML and loader is None:
+            raise ImportError(
+                "PyYAML was installed without libyaml, reinstall it with the C "
+                "extension or unset FRONTMATTER_REQUIRE_LIBYAML"
+            )
+        self.loader = loader or SafeLoader
+        self.dumper = dumper or SafeDumper
+        self.flat = flat
+
+    @property
+    def backend(self) -> str:
+        name = self.loader.__name__
+        if name == "CSafeLoader":
+            name = "libyaml"
+        elif name == "SafeLoader":
+            name = "pyyaml"
+        return f"{name}+flat" if self.flat else name
+
     def load(self, fm: str, **kwargs: object) -> Any:
         """
         Parse YAML frontmatter.
         """
-        kwargs.setdefault("Loader", SafeLoader)
+        if self.flat and not kwargs:
+            metadata = load_flat(fm)
+            if metadata is not None:
+                return metadata
+        kwargs.setdefault("Loader", self.loader)
         return yaml.load(fm, **kwargs)  # type: ignore[arg-type]
 
     def export(self, metadata: dict[str, object], **kwargs: object) -> str:
         """
         Export metadata as YAML.
         """
-        kwargs.setdefault("Dumper", SafeDumper)
+        kwargs.setdefault("Dumper", self.dumper)
         kwargs.setdefault("default_flow_style", False)
         kwargs.setdefault("allow_unicode", True)
 
@@ -158,9 +244,27 @@ class TOMLHandler(BaseHandler):  # pyright: ignore
     FM_BOUNDARY = re.compile(r"^\+{3,}\s*$", re.MULTILINE)
     START_DELIMITER = END_DELIMITER = "+++"
 
+    def __init__(
+        self,
+        fm_boundary: re.Pattern[str] | None = None,
+        start_delimiter: str | None = None,
+        end_delimiter: str | None = None,
+        loads: Callable[..., dict[str, Any]] | None = None,
+    ):
+        """
+        `loads` defaults to the standard library's `tomllib.loads`; any function with the
+        same signature will do (`rtoml.loads`, `tomli.loads`).
+        """
+        super().__init__(fm_boundary, start_delimiter, end_delimiter)
+        self.loads = loads or toml.loads
+
+    @property
+    def backend(self) -> str:
+        module = getattr(self.loads, "__module__", None)
+        return module.split(".")[0] if module else repr(self.loads)
+
     def load(self, fm: str, **kwargs: object) -> Any:
-        assert toml is not None
-        return toml.loads(fm, **kwargs)  # pyright: ignore
+        return self.loads(fm, **kwargs)  # pyright: ignore
 
     def export(self, metadata: dict[str, object], **kwargs: object) -> str:
         "Turn metadata into TOML"
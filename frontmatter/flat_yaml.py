@@ -0,0 +1,131 @@
+"""
+A fast path for the flat YAML frontmatter most Hugo posts have:
+
+    title: "Roger Bacon as magician"
+    date: 2024-03-01
+    tags: [history, alchemy]
+    draft: false
+
+`load_flat` handles one `key: value` per line, where a value is a quoted string, a plain
+scalar or a one-line flow list of scalars. It gives exactly what `yaml.safe_load` would,
+and returns None for anything it isn't sure about (nesting, block lists, anchors,
+escapes, timestamps, numbers in any form but the plainest...) so the caller can fall back
+to the real loader. It never guesses.
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+from typing import Any
+
+__all__ = ["load_flat"]
+
+_line = re.compile(r"([A-Za-z_][A-Za-z0-9_-]*):(?: +(.*))?")
+_int = re.compile(r"[-+]?(?:0|[1-9][0-9]*)")
+_float = re.compile(r"[-+]?[0-9]+\.[0-9]+")
+_date = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+# YAML 1.1 (what PyYAML implements) booleans and nulls
+_bools = {
+    **dict.fromkeys(["true", "True", "TRUE", "yes", "Yes", "YES", "on", "On", "ON"], True),
+    **dict.fromkeys(["false", "False", "FALSE", "no", "No", "NO", "off", "Off", "OFF"], False),
+}
+_nulls = {"", "~", "null", "Null", "NULL"}
+
+# a plain scalar can't start with these, and anything starting with a digit, sign or dot
+# could be one of YAML's number forms
+_indicators = set("-?:,[]{}#&*!|>'\"%@`.+=<0123456789")
+
+# not a plain scalar, a plain scalar that's something other than a string, or a value
+# that could be parsed differently in a flow list
+_unsafe = re.compile(r": |:$| #|\t|[\[\]{},]")
+
+# line breaks other than \n, and characters YAML refuses to read
+_awkward = re.compile(
+    "[^\x09\x0A\x20-\x7E\xA0-\u2027\u202A-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]"
+)
+
+_MISSING = object()
+
+
+def _scalar(value: str, in_list: bool = False) -> Any:
+    """
+    The value of a single scalar, or `_MISSING` if it isn't one of the simple forms.
+    """
+    if not value:
+        return None if not in_list else _MISSING
+    first = value[0]
+    if first == '"':
+        inner = value[1:-1]
+        if len(value) < 2 or value[-1] != '"' or '"' in inner or "\\" in inner:
+            return _MISSING
+        if in_list and ("," in inner or "]" in inner):
+            return _MISSING
+        return inner
+    if first == "'":
+        inner = value[1:-1]
+        if len(value) < 2 or value[-1] != "'" or "'" in inner:
+            return _MISSING
+        if in_list and ("," in inner or "]" in inner):
+            return _MISSING
+        return inner
+
+    if value in _bools:
+        return _bools[value]
+    if value in _nulls:
+        return None
+    if _int.fullmatch(value):
+        return int(value)
+    if _float.fullmatch(value):
+        return float(value)
+    match = _date.fullmatch(value)
+    if match:
+        try:
+            return datetime.date(*(int(part) for part in match.groups()))
+        except ValueError:
+            return _MISSING
+    if first in _indicators or _unsafe.search(value) or value != value.strip():
+        return _MISSING
+    if in_list and ":" in value:
+        return _MISSING
+    return value
+
+
+def load_flat(text: str) -> dict[str, Any] | None:
+    """
+    Parse flat `key: value` frontmatter, or return None if it isn't flat.
+    """
+    if _awkward.search(text):
+        return None
+    result: dict[str, Any] = {}
+    for raw in text.split("\n"):
+        line = raw.rstrip(" ")
+        if not line or line[0] == "#":
+            continue
+        match = _line.fullmatch(line)
+        if match is None:
+            return None
+        key, value = match.groups()
+        if key in _bools or key in _nulls or key in result:
+            return None
+        value = value or ""
+
+        if value.startswith("["):
+            if not value.endswith("]") or "#" in value or "\t" in value:
+                return None
+            inner = value[1:-1].strip()
+            items: list[Any] = []
+            if inner:
+                for part in inner.split(","):
+                    item = _scalar(part.strip(), in_list=True)
+                    if item is _MISSING:
+                        return None
+                    items.append(item)
+            result[key] = items
+        else:
+            scalar = _scalar(value)
+            if scalar is _MISSING:
+                return None
+            result[key] = scalar
+    return result or None
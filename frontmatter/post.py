@@ -1,10 +1,13 @@
 from __future__ import (
     annotations,
 )  # makes annotations strings automatically, so forward referencing works (?)
+from os import PathLike
 from typing import Any, Iterable
+from .util import u
+
 # from .default_handlers import BaseHandler  # this creates a circular import
 
-__all__ = ["Post"]
+__all__ = ["Post", "LazyPost"]
 
 
 class Post(object):
@@ -20,6 +23,10 @@ class Post(object):
     >>> # set a new key/value
     >>> post["foo"] = "bar"
     >>> print(frontmatter.dumps(post))
+
+    A Post from `load` or `loads` keeps its raw frontmatter and only runs the YAML or
+    TOML loader the first time the metadata is used, so an error in the frontmatter is
+    raised then.
     """
 
     def __init__(
@@ -30,9 +37,32 @@ class Post(object):
         **metadata: object,
     ) -> None:  # I'm not sure it makes sense to have a return value here?
         self.content = str(content)
-        self.metadata = metadata
+        self._metadata = metadata
+        self._fm: str | None = None  # frontmatter that hasn't been parsed yet
         self.handler = handler
 
+    @classmethod
+    def _unparsed(
+        cls, content: str, handler: Any, fm: str, defaults: dict[str, object]
+    ) -> Post:
+        post = cls(content, handler, **defaults)
+        post._fm = fm
+        return post
+
+    @property
+    def metadata(self) -> dict[str, object]:
+        if self._fm is not None:
+            fm_data = self.handler.load(self._fm)
+            if isinstance(fm_data, dict):
+                self._metadata.update(fm_data)
+            self._fm = None
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: dict[str, object]) -> None:
+        self._metadata = value
+        self._fm = None
+
     def __getitem__(self, name: str) -> object:
         return self.metadata[name]  # e.g. post["title"]
 
@@ -68,3 +98,110 @@ class Post(object):
         d = self.metadata.copy()
         d["content"] = self.content
         return d
+
+
+class LazyPost(object):
+    """
+    A Post that only holds what's been read from the file's header. The frontmatter is
+    parsed on the first metadata access, and the content is read from disk the first
+    time it's needed. Created by `scan_header <frontmatter.scan_header>` and
+    `scan_headers <frontmatter.scan_headers>`:
+
+    >>> drafts = [p for p in frontmatter.scan_headers(paths) if p.get("draft")]
+    >>> print(drafts[0].content)  # reads the rest of the file
+
+    Uses `__slots__`, so holding tens of thousands of these is cheap.
+    """
+
+    __slots__ = (
+        "path",
+        "handler",
+        "encoding",
+        "_fm",
+        "_content_offset",
+        "_defaults",
+        "_metadata",
+        "_content",
+    )
+
+    def __init__(
+        self,
+        path: str | PathLike[str],
+        handler: Any | None,
+        fm: str | None,
+        content_offset: int,
+        encoding: str = "utf-8",
+        **defaults: object,
+    ) -> None:
+        self.path = path
+        self.handler = handler
+        self.encoding = encoding
+        self._fm = fm  # the raw frontmatter text
+        self._content_offset = content_offset  # byte offset of the content in the file
+        self._defaults = defaults
+        self._metadata: dict[str, object] | None = None
+        self._content: str | None = None
+
+    @property
+    def metadata(self) -> dict[str, object]:
+        if self._metadata is None:
+            metadata = self._defaults.copy()
+            if self.handler is not None and self._fm is not None:
+                fm_data = self.handler.load(u(self._fm))
+                if isinstance(fm_data, dict):
+                    metadata.update(fm_data)
+            self._metadata = metadata
+            self._fm = None  # not needed any more
+        return self._metadata
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            with open(self.path, "rb") as f:
+                f.seek(self._content_offset)
+                data = f.read()
+            self._content = u(data, self.encoding).strip()
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = str(value)
+
+    @property
+    def loaded(self) -> bool:
+        """
+        True once the content has been read.
+        """
+        return self._content is not None
+
+    def __getitem__(self, name: str) -> object:
+        return self.metadata[name]
+
+    def __contains__(self, item: object) -> bool:
+        return item in self.metadata
+
+    def __setitem__(self, name: str, value: object) -> None:
+        self.metadata[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        del self.metadata[name]
+
+    def __bytes__(self) -> bytes:
+        return self.content.encode("utf-8")
+
+    def __str__(self) -> str:
+        return self.content
+
+    def get(self, key: str, default: object = None) -> object:
+        return self.metadata.get(key, default)
+
+    def keys(self) -> Iterable[str]:
+        return self.metadata.keys()
+
+    def values(self) -> Iterable[object]:
+        return self.metadata.values()
+
+    def to_dict(self) -> dict[str, object]:
+        d = self.metadata.copy()
+        d["content"] = self.content
+        return d
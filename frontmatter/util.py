@@ -20,5 +20,7 @@ def u(text: str | bytes, encoding: str = "utf-8") -> str:
     else:
         text_str = str(text)
 
-    text_str = text_str.replace("\r\n", "\n")
+    # skip the copy for the usual case of a file that's already got unix line endings
+    if "\r" in text_str:
+        text_str = text_str.replace("\r\n", "\n")
     return text_str
@@ -0,0 +1,3 @@
+from .metrics import Metrics, registry, timer, timed, count, enable, disable
+
+__all__ = ["Metrics", "registry", "timer", "timed", "count", "enable", "disable"]
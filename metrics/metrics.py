@@ -0,0 +1,243 @@
+"""
+Timers and counters for finding out where an index run or a search spends its time.
+
+Instrumentation is off by default, and then costs one attribute check per call: `timer`
+hands back a shared do-nothing context manager, and `count` returns straight away.
+
+>>> from metrics import enable, registry, timer
+>>> enable(slow_log="slow.jsonl", slow_threshold=0.5)
+>>> with timer("markdown"):
+...     nodes = markdown(content)
+>>> registry.write("metrics.prom")  # Prometheus text format, or JSON for any other suffix
+
+Each timer records a count, a total and a maximum. The slow log gets a JSON line for each
+file (or anything else passed to `slow`) that took longer than the threshold, with the
+stages it was timed in.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+__all__ = ["Metrics", "registry", "timer", "timed", "count", "enable", "disable"]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# {"timers": {name: [count, total, max]}, "counters": {name: n}}
+Raw = dict[str, dict[str, Any]]
+
+
+class _NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: Metrics, name: str) -> None:
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics(object):
+    """
+    A registry of timers and counters. Usually the module's `registry` is used, through
+    `timer`, `count` and friends.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.slow_log: Path | None = None
+        self.slow_threshold = 1.0
+        self.timers: dict[str, list[float]] = {}
+        self.counters: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def enable(
+        self, slow_log: str | os.PathLike[str] | None = None, slow_threshold: float = 1.0
+    ) -> None:
+        self.slow_log = Path(slow_log) if slow_log is not None else None
+        self.slow_threshold = slow_threshold
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timers = {}
+            self.counters = {}
+
+    def timer(self, name: str) -> _Timer | _NullTimer:
+        """
+        A context manager that adds the time spent in it to the `name` timer.
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """
+        A decorator version of `timer`.
+        """
+
+        def decorate(fn: F) -> F:
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Timer(self, name):
+                    return fn(*args, **kwargs)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self.lock:
+            timing = self.timers.get(name)
+            if timing is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                if seconds > timing[2]:
+                    timing[2] = seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def totals(self) -> dict[str, float]:
+        """
+        Total seconds per timer, for working out what a single call spent where.
+        """
+        with self.lock:
+            return {name: timing[1] for name, timing in self.timers.items()}
+
+    def slow(self, key: str, seconds: float, **details: Any) -> None:
+        """
+        Log `key` to the slow log if `seconds` is over the threshold.
+        """
+        if not self.enabled or self.slow_log is None or seconds < self.slow_threshold:
+            return
+        record = {"key": key, "seconds": round(seconds, 6), **details}
+        line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def raw(self) -> Raw:
+        with self.lock:
+            return {
+                "timers": {name: list(timing) for name, timing in self.timers.items()},
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, raw: Raw) -> None:
+        """
+        Add the timers and counters from another registry's `raw()`, for example one in
+        a worker process.
+        """
+        with self.lock:
+            for name, (n, total, longest) in raw["timers"].items():
+                timing = self.timers.setdefault(name, [0, 0.0, 0.0])
+                timing[0] += n
+                timing[1] += total
+                timing[2] = max(timing[2], longest)
+            for name, n in raw["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict[str, Any]:
+        raw = self.raw()
+        return {
+            "timers": {
+                name: {
+                    "count": int(n),
+                    "total_s": total,
+                    "mean_s": total / n if n else 0.0,
+                    "max_s": longest,
+                }
+                for name, (n, total, longest) in sorted(raw["timers"].items())
+            },
+            "counters": dict(sorted(raw["counters"].items())),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "blogsearch") -> str:
+        """
+        The Prometheus text exposition format, e.g. for node_exporter's textfile
+        collector or a /metrics endpoint.
+        """
+        raw = self.raw()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, (n, total, _) in sorted(raw["timers"].items()):
+            label = _label(name)
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{label}"}} {total:.9f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{label}"}} {int(n)}')
+        lines += [
+            f"# HELP {prefix}_stage_seconds_max Longest single call of each stage.",
+            f"# TYPE {prefix}_stage_seconds_max gauge",
+        ]
+        for name, (_, _, longest) in sorted(raw["timers"].items()):
+            lines.append(
+                f'{prefix}_stage_seconds_max{{stage="{_label(name)}"}} {longest:.9f}'
+            )
+        lines += [
+            f"# HELP {prefix}_events_total Counted events.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for name, n in sorted(raw["counters"].items()):
+            lines.append(f'{prefix}_events_total{{event="{_label(name)}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | os.PathLike[str]) -> None:
+        """
+        Write the metrics to `path`: Prometheus text for a `.prom` file, JSON otherwise.
+        The file is replaced atomically, so a collector never reads half of it.
+        """
+        path = Path(path)
+        text = self.to_prometheus() if path.suffix == ".prom" else self.to_json()
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Metrics()
+timer = registry.timer
+timed = registry.timed
+count = registry.count
+enable = registry.enable
+disable = registry.disable
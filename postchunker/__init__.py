@@ -1,3 +1,4 @@
-from .postchunker import extract_sections
+from .postchunker import extract_sections, iter_sections, iter_chunks, section_text
+from .ast_cache import ASTCache
 
-__all__ = ["extract_sections"]
+__all__ = ["extract_sections", "iter_sections", "iter_chunks", "section_text", "ASTCache"]
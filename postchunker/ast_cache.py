@@ -0,0 +1,159 @@
+"""
+A persistent cache of mistune ASTs.
+
+Trying out different chunking settings means re-chunking every post, but the markdown
+itself hasn't changed, so there's no need to parse it again. Parsed trees are stored one
+file per post, pickled with protocol 5, and keyed by a hash of the body, the mistune
+version and the plugins, so a change to any of them is a miss rather than a stale tree.
+
+The cache has a size limit. Entries are evicted least recently used first, and a hit
+touches the file's mtime, so the LRU order survives restarts and is shared by every
+process using the same directory (the indexer's worker processes, for example). Each
+process's view of the directory goes stale as the others write to it, so a key it doesn't
+know about is still looked for on disk, and the directory is scanned again before
+anything is evicted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, cast
+
+import mistune
+
+__all__ = ["ASTCache"]
+
+
+class ASTCache(object):
+    """
+    >>> cache = ASTCache("./ast_cache", plugins=["footnotes"])
+    >>> nodes = cache.parse(post.content)  # parsed once, loaded from disk after that
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | os.PathLike[str],
+        plugins: Iterable[str] = ("footnotes",),
+        max_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.dir = Path(cache_dir)
+        self.plugins = sorted(plugins)
+        self.max_bytes = max_bytes
+        self.markdown = mistune.create_markdown(renderer=None, plugins=self.plugins)
+        self._salt = f"{mistune.__version__}\0{','.join(self.plugins)}\0".encode()
+        self.hits = 0
+        self.misses = 0
+
+        # key -> size, least recently used first
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.total_bytes = 0
+        # written by this process since the directory was last scanned
+        self._unscanned = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        self.entries.clear()
+        self.total_bytes = 0
+        self._unscanned = 0
+        if not self.dir.exists():
+            return
+        found = []
+        for entry in os.scandir(self.dir):
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process
+                found.append((stat.st_mtime_ns, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def key(self, text: str) -> str:
+        return hashlib.blake2b(
+            self._salt + text.encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.pkl"
+
+    def get(self, key: str) -> List[Dict[str, Any]] | None:
+        # tried even if it isn't in `entries`: another process may have written it
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                nodes = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            # never written, or evicted by another process
+            self._forget(key)
+            return None
+        except Exception:
+            # a damaged entry (unpickling raises all sorts of errors) is just a miss
+            self._forget(key)
+            path.unlink(missing_ok=True)
+            return None
+        self._forget(key)
+        self.entries[key] = size
+        self.total_bytes += size
+        return nodes
+
+    def put(self, key: str, nodes: List[Dict[str, Any]]) -> None:
+        data = pickle.dumps(nodes, protocol=5)
+        if len(data) > self.max_bytes:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file and renamed, so readers never see half an entry
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+
+        if key in self.entries:
+            self.total_bytes -= self.entries[key]
+        self.entries[key] = len(data)
+        self.entries.move_to_end(key)
+        self.total_bytes += len(data)
+        self._unscanned += len(data)
+        # the other processes' writes only show up in a scan, so one is done every so
+        # often; together they can overshoot the limit by about a sixteenth each
+        if self._unscanned > self.max_bytes // 16:
+            self._scan()
+        if self.total_bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * 0.9))
+
+    def evict(self, target_bytes: int) -> None:
+        """
+        Delete least recently used entries until the cache is under `target_bytes`.
+        """
+        # other processes have added (and evicted) entries since this one last looked
+        self._scan()
+        while self.entries and self.total_bytes > target_bytes:
+            key = next(iter(self.entries))
+            self._path(key).unlink(missing_ok=True)
+            self._forget(key)
+
+    def _forget(self, key: str) -> None:
+        size = self.entries.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def parse(self, text: str) -> List[Dict[str, Any]]:
+        """
+        The AST for a post's markdown, from the cache if it's there.
+        """
+        key = self.key(text)
+        nodes = self.get(key)
+        if nodes is not None:
+            self.hits += 1
+            return nodes
+        self.misses += 1
+        nodes = cast(List[Dict[str, Any]], self.markdown(text))
+        self.put(key, nodes)
+        return nodes
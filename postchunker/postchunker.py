@@ -1,96 +1,271 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import re
 
-__all__ = ["extract_sections"]
+__all__ = ["extract_sections", "iter_sections", "iter_chunks", "section_text"]
 
+_BREAKS = ("softbreak", "linebreak", "blank_line")
 
-def extract_text_from_node(node: Dict[str, Any]) -> str:
-    if node["type"] == "text":
-        return node["raw"]
+# (start, end, node type) of a piece of text that came from a node
+Span = Tuple[int, int, str]
+
+
+def walk_text(
+    nodes: List[Dict[str, Any]],
+    parts: List[str],
+    spans: Optional[List[Span]] = None,
+    pos: int = 0,
+) -> int:
+    """
+    Append the text of `nodes` to `parts`, and return the new length of the text.
 
-    # this will remove the footnotes section, as long as it's properly structured
-    # TODO: check how brittle this is
-    if node["type"] == "footnote_item":
-        return ""
+    This is a walk with an explicit stack rather than recursion, so deeply nested lists
+    can't hit the recursion limit. Strings on the stack are literal text (list markers,
+    newlines) to write out when they're reached. If `spans` is given, the position of
+    the text from each text and code node is recorded, relative to the start of `parts`.
+    """
+    stack: List[Any] = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            pos += len(node)
+            continue
 
-    if node["type"] == "block_code":
-        lang = node["attrs"].get("info", "")
-        code = node["raw"]
-        if lang:
-            return f"\n\nCode ({lang}):\n{code}\n\n"
-        return f"\n\nCode:\n{code}\n\n"
+        node_type = node["type"]
+        if node_type == "text":
+            raw = node["raw"]
+            if spans is not None:
+                spans.append((pos, pos + len(raw), node_type))
+            parts.append(raw)
+            pos += len(raw)
 
-    if (
-        node["type"] == "softbreak"
-        or node["type"] == "linebreak"
-        or node["type"] == "blank_line"
-    ):
-        return " "
+        # this will remove the footnotes section, as long as it's properly structured
+        # TODO: check how brittle this is
+        elif node_type == "footnote_item":
+            continue
 
-    # a list is made up of list_items that contain block_text nodes
-    if node["type"] == "list":
-        items_text = extract_text(node["children"])
-        return f"\n{items_text}\n"
+        elif node_type == "block_code":
+            # a fence without a language has no attrs
+            lang = node.get("attrs", {}).get("info", "")
+            code = node["raw"]
+            prefix = f"\n\nCode ({lang}):\n" if lang else "\n\nCode:\n"
+            pos += len(prefix)
+            if spans is not None:
+                spans.append((pos, pos + len(code), node_type))
+            parts.extend((prefix, code, "\n\n"))
+            pos += len(code) + 2
 
-    # list items
-    if node["type"] == "list_item":
-        item_text = extract_text(node["children"])
-        return f"- {item_text}\n"
+        elif node_type in _BREAKS:
+            parts.append(" ")
+            pos += 1
 
-    # list_item text
-    if node["type"] == "block_text":
-        return extract_text(node["children"])
+        # a list is made up of list_items that contain block_text nodes;
+        # suffixes are pushed first so they come off the stack after the children
+        elif node_type == "list":
+            stack.append("\n")
+            stack.extend(reversed(node["children"]))
+            stack.append("\n")
 
-    if node["type"] == "paragraph":
-        text = extract_text(node["children"])
-        return text + "\n\n"
+        elif node_type == "list_item":
+            stack.append("\n")
+            stack.extend(reversed(node["children"]))
+            stack.append("- ")
 
-    if "children" in node:
-        return extract_text(node["children"])
+        elif node_type == "paragraph":
+            stack.append("\n\n")
+            stack.extend(reversed(node["children"]))
 
-    return ""
+        # block_text (list item text) and everything else with children
+        elif "children" in node:
+            stack.extend(reversed(node["children"]))
+
+    return pos
 
 
 def extract_text(nodes: List[Dict[str, Any]]) -> str:
-    return "".join(extract_text_from_node(node) for node in nodes)
+    parts: List[str] = []
+    walk_text(nodes, parts)
+    return "".join(parts)
+
+
+def extract_text_from_node(node: Dict[str, Any]) -> str:
+    return extract_text([node])
+
+
+_footnote_ref = re.compile(r"\[\^\d+\]")
 
 
 def clean_text(text: str) -> str:
     # remove footnote references:
-    text = re.sub(r"\[\^\d+\]", "", text)
+    text = _footnote_ref.sub("", text)
     return text
 
 
-# Possible improvements:
-# - add sliding window
-# - check content length and handle short/long content
-def extract_sections(
+def clean_section(text: str, spans: List[Span]) -> Tuple[str, List[Span]]:
+    """
+    `clean_text` for a whole section, moving the spans to match the cleaned text.
+    """
+    if "[^" not in text:
+        return text, spans
+
+    removed: List[Tuple[int, int]] = []  # (end in the original text, total removed)
+    total = 0
+    for match in _footnote_ref.finditer(text):
+        total += match.end() - match.start()
+        removed.append((match.end(), total))
+    if not removed:
+        return text, spans
+
+    def shift(offset: int) -> int:
+        delta = 0
+        for end, total in removed:
+            if end > offset:
+                break
+            delta = total
+        return offset - delta
+
+    return _footnote_ref.sub("", text), [
+        (shift(start), shift(end), node_type) for start, end, node_type in spans
+    ]
+
+
+def iter_sections(
     ast: List[Dict[str, Any]], headings: List[str] = []
-) -> List[Dict[str, str]]:
-    sections = []
-    current_section = {"headings": headings, "content": []}
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield sections one at a time. A section starts at each heading and holds the text of
+    the nodes up to the next heading, as a single string in "content". "spans" holds
+    the position of the text from each text and code node in that string.
+
+    The mistune AST doesn't carry source positions, so the spans are offsets into the
+    extracted text, not into the markdown.
+    """
+    parts: List[str] = []
+    spans: List[Span] = []
+    pos = 0
+
+    def section() -> Dict[str, Any]:
+        text, section_spans = clean_section("".join(parts), spans)
+        return {"headings": headings, "content": [text], "spans": section_spans}
 
     for node in ast:
         if node["type"] == "heading":
-            #  append previouw section to sections
-            if current_section["content"]:
-                sections.append(current_section)
+            #  yield the previous section
+            if parts:
+                yield section()
+                parts.clear()
+                spans = []
+                pos = 0
 
             # start a new section
             heading_text = extract_text(node["children"])
             level = node["attrs"]["level"]
 
             headings = headings[: level - 1] + [heading_text]
-            current_section = {"headings": headings, "content": []}
 
         else:
-            text = extract_text_from_node(node)
-            text = clean_text(text)
-            if text.strip():
-                current_section["content"].append(text)
+            mark, mark_spans = len(parts), len(spans)
+            end = walk_text([node], parts, spans, pos)
+            # drop nodes that are only whitespace (blank lines, empty footnotes section)
+            if any(part.strip() for part in parts[mark:]):
+                pos = end
+            else:
+                del parts[mark:]
+                del spans[mark_spans:]
+
+    # yield the last section
+    if parts:
+        yield section()
+
+
+def extract_sections(
+    ast: List[Dict[str, Any]], headings: List[str] = []
+) -> List[Dict[str, Any]]:
+    return list(iter_sections(ast, headings))
+
+
+_word = re.compile(r"\S+")
+
+
+def iter_chunks(
+    ast: List[Dict[str, Any]],
+    headings: List[str] = [],
+    max_tokens: int = 256,
+    overlap: int = 32,
+    min_tokens: int = 64,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield chunks of at most `max_tokens` tokens. Tokens are approximated by
+    whitespace-separated words, which keeps this independent of the embedding model's
+    tokenizer (expect roughly 1.3 model tokens per word for English prose).
+
+    - sections shorter than `min_tokens` are merged with the sections that follow them,
+      as long as the result fits in `max_tokens`
+    - sections longer than `max_tokens` are split into windows that share `overlap`
+      tokens with the previous window
+
+    Each chunk has the same "headings" and "content" keys as a section (so `section_text`
+    works on it), with the headings of the section it starts in. "start" and "end" are
+    character offsets into the post's text: the sections' content joined end to end.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap has to be smaller than max_tokens")
+
+    # the group of (merged) sections waiting to be chunked
+    parts: List[str] = []
+    spans: List[Tuple[int, int]] = []  # word offsets, relative to the group
+    group_headings: List[str] = headings
+    group_start = 0  # offset of the group in the post's text
+    group_len = 0
+
+    def flush() -> Iterator[Dict[str, Any]]:
+        text = "".join(parts)
+        step = max_tokens - overlap
+        i = 0
+        while i < len(spans):
+            j = min(i + max_tokens, len(spans))
+            start, end = spans[i][0], spans[j - 1][1]
+            yield {
+                "headings": group_headings,
+                "content": [text[start:end]],
+                "start": group_start + start,
+                "end": group_start + end,
+            }
+            if j == len(spans):
+                break
+            i += step
+
+    for section in iter_sections(ast, headings):
+        text = "".join(section["content"])
+        words = [(m.start(), m.end()) for m in _word.finditer(text)]
+
+        # this section doesn't fit with the short ones before it
+        if spans and len(spans) + len(words) > max_tokens:
+            yield from flush()
+            group_start += group_len
+            parts, spans, group_len = [], [], 0
+
+        if not parts:
+            group_headings = section["headings"]
+        spans.extend((start + group_len, end + group_len) for start, end in words)
+        parts.append(text)
+        group_len += len(text)
+
+        if len(spans) >= min_tokens:
+            yield from flush()
+            group_start += group_len
+            parts, spans, group_len = [], [], 0
+
+    if spans:
+        yield from flush()
 
-    # append the last section
-    if current_section["content"]:
-        sections.append(current_section)
 
-    return sections
+def section_text(section: Dict[str, Any]) -> str:
+    """
+    Join a section's headings and content into the text that gets embedded.
+    """
+    heading = " > ".join(h for h in section["headings"] if h)
+    content = "".join(section["content"]).strip()
+    if heading:
+        return f"{heading}\n\n{content}"
+    return content
@@ -0,0 +1,55 @@
+"""
+Names are imported from their modules on first use: the indexer needs mistune and the
+frontmatter parsers, a process that only reads the manifest doesn't.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .manifest import Manifest
+    from .pipeline import IngestPipeline
+    from .postindexer import (
+        IncrementalIndexer,
+        should_process_file,
+        iter_posts,
+        content_hash,
+        chunk_post,
+        section_key,
+        post_metadata,
+        parse_job,
+        parse_markdown,
+    )
+    from .watch import Watcher
+
+_modules = {
+    "Manifest": ".manifest",
+    "IngestPipeline": ".pipeline",
+    "IncrementalIndexer": ".postindexer",
+    "should_process_file": ".postindexer",
+    "iter_posts": ".postindexer",
+    "content_hash": ".postindexer",
+    "chunk_post": ".postindexer",
+    "section_key": ".postindexer",
+    "post_metadata": ".postindexer",
+    "parse_job": ".postindexer",
+    "parse_markdown": ".postindexer",
+    "Watcher": ".watch",
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str) -> Any:
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,108 @@
+"""
+A persistent record of what has been indexed.
+
+For every post the manifest stores the mtime, size and content hash of the file that was
+indexed, along with the ids of the chunks that were written for it and the metadata they
+were written with. That's enough to decide if a post needs to be re-indexed, and to find
+the chunks that need to be deleted when it changes or is removed.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+
+__all__ = ["Manifest"]
+
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+    """
+    Maps a post's path (relative to the content root) to its manifest entry:
+
+    >>> manifest = Manifest("./index_manifest.json")
+    >>> manifest["notes/alchemy-restored.md"]
+    {'mtime_ns': ..., 'size': 4312, 'hash': '9b1c...', 'chunk_ids': ['notes/alchemy-restored.md#3f2a9c0e1b7d4a65', ...], 'metadata': {...}}
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path)
+        self.entries: dict[str, dict[str, Any]] = {}
+        # the settings the posts were indexed with (chunking, ...)
+        self.options: dict[str, Any] = {}
+        if self.path.exists():
+            self.load()
+
+    def load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            # an old manifest can't be trusted, so everything gets re-indexed
+            self.entries = {}
+            return
+        self.entries = data["posts"]
+        self.options = data.get("options", {})
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically, so that an interrupted run never leaves a
+        truncated file behind.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": MANIFEST_VERSION,
+                        "options": self.options,
+                        "posts": self.entries,
+                    },
+                    f,
+                )
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def is_fresh(self, rel: str, stat: os.stat_result) -> bool:
+        """
+        Cheap check: a post is unchanged if its mtime and size match the manifest.
+        """
+        entry = self.entries.get(rel)
+        if entry is None:
+            return False
+        return entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+
+    def touch(self, rel: str, stat: os.stat_result) -> None:
+        """
+        Record a new mtime/size for a post whose content hash hasn't changed.
+        """
+        entry = self.entries[rel]
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+
+    def __getitem__(self, rel: str) -> dict[str, Any]:
+        return self.entries[rel]
+
+    def __setitem__(self, rel: str, entry: dict[str, Any]) -> None:
+        self.entries[rel] = entry
+
+    def __delitem__(self, rel: str) -> None:
+        del self.entries[rel]
+
+    def __contains__(self, rel: object) -> bool:
+        return rel in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, rel: str) -> dict[str, Any] | None:
+        return self.entries.get(rel)
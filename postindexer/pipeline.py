@@ -0,0 +1,149 @@
+"""
+Fan CPU-bound work (frontmatter parsing, building the mistune AST, extracting sections)
+out across a process pool, and stream the results back in batches.
+
+Results come back in the order the jobs were submitted, no matter which worker finishes
+first, so an index built with 8 workers is identical to one built with 1. The number of
+jobs in flight is bounded, so a huge content tree is never read into memory at once: the
+producer blocks until the consumer has taken the oldest result.
+
+When metrics are enabled, each job is timed, the timers recorded in the worker are sent
+back and merged into the parent's, and jobs over the slow-log threshold are logged.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Generic, Iterable, Iterator, TypeVar
+
+import metrics
+
+__all__ = ["IngestPipeline"]
+
+C = TypeVar("C")  # context that stays in the parent process (path, stat, hash, ...)
+J = TypeVar("J")  # the job sent to a worker, must be picklable
+R = TypeVar("R")  # the worker's result, must be picklable
+
+
+def _measured(fn: Callable[[J], R], job: J) -> tuple[R, float, metrics.metrics.Raw]:
+    """
+    Run a job in a worker with metrics on, and return what it recorded along with the
+    result. The worker's registry only ever holds the current job's timings.
+    """
+    metrics.registry.enabled = True
+    metrics.registry.slow_log = None
+    metrics.registry.reset()
+    start = time.perf_counter()
+    result = fn(job)
+    return result, time.perf_counter() - start, metrics.registry.raw()
+
+
+class IngestPipeline(Generic[J, R]):
+    """
+    >>> pipeline = IngestPipeline(parse_job, workers=8, batch_size=64)
+    >>> for batch in pipeline.batches((path, path.read_bytes()) for path in paths):
+    ...     write(batch)  # [(path, result), ...] in the same order as `paths`
+
+    `fn` is called in the worker processes, so it has to be a module level function.
+    With `workers=1` (or 0) everything runs in the calling process, which is handy for
+    debugging and avoids the pool start-up cost for small updates.
+
+    `label` names a job's context in the slow log, e.g. `lambda context: context[0]`.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[J], R],
+        workers: int | None = None,
+        batch_size: int = 64,
+        max_pending: int | None = None,
+        label: Callable[[Any], str] = str,
+    ) -> None:
+        self.fn = fn
+        self.label = label
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(workers, 1)
+        self.batch_size = max(batch_size, 1)
+        # enough work queued to keep every worker busy while the writer is running
+        self.max_pending = max_pending or self.workers * 4
+
+    def map(self, jobs: Iterable[tuple[C, J]]) -> Iterator[tuple[C, R]]:
+        """
+        Yield `(context, fn(job))` for each `(context, job)`, in input order.
+        """
+        if metrics.registry.enabled:
+            return self._map_measured(jobs)
+        return self._map(self.fn, jobs)
+
+    def _map(
+        self, fn: Callable[[J], Any], jobs: Iterable[tuple[C, J]]
+    ) -> Iterator[tuple[C, Any]]:
+        if self.workers == 1:
+            for context, job in jobs:
+                yield context, fn(job)
+            return
+
+        pending: deque[tuple[C, Future[Any]]] = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for context, job in jobs:
+                    pending.append((context, executor.submit(fn, job)))
+                    # backpressure: don't pull more jobs until the oldest is consumed
+                    if len(pending) >= self.max_pending:
+                        context, future = pending.popleft()
+                        yield context, future.result()
+                while pending:
+                    context, future = pending.popleft()
+                    yield context, future.result()
+            finally:
+                # if the consumer stops early (or a job fails), don't run the rest
+                for _, future in pending:
+                    future.cancel()
+
+    def _map_measured(self, jobs: Iterable[tuple[C, J]]) -> Iterator[tuple[C, R]]:
+        registry = metrics.registry
+        if self.workers == 1:
+            for context, job in jobs:
+                logging = registry.slow_log is not None
+                before = registry.totals() if logging else {}
+                start = time.perf_counter()
+                result = self.fn(job)
+                seconds = time.perf_counter() - start
+                registry.observe("pipeline.job", seconds)
+                if logging and seconds >= registry.slow_threshold:
+                    after = registry.totals()
+                    stages = {k: v - before.get(k, 0.0) for k, v in after.items()}
+                    self._log_slow(context, seconds, stages)
+                yield context, result
+            return
+
+        for context, (result, seconds, raw) in self._map(
+            partial(_measured, self.fn), jobs
+        ):
+            registry.merge(raw)
+            registry.observe("pipeline.job", seconds)
+            stages = {name: timing[1] for name, timing in raw["timers"].items()}
+            self._log_slow(context, seconds, stages)
+            yield context, result
+
+    def _log_slow(self, context: C, seconds: float, stages: dict[str, float]) -> None:
+        stages = {name: round(s, 6) for name, s in stages.items() if s > 0}
+        metrics.registry.slow(self.label(context), seconds, stages=stages)
+
+    def batches(self, jobs: Iterable[tuple[C, J]]) -> Iterator[list[tuple[C, R]]]:
+        """
+        Like `map`, but groups the results into lists of up to `batch_size`.
+        """
+        batch: list[tuple[C, R]] = []
+        for item in self.map(jobs):
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
@@ -0,0 +1,488 @@
+"""
+Incrementally index a directory of markdown posts.
+
+Only posts whose bytes have changed since the last run are re-parsed and re-chunked, and
+of those, only the sections that changed are re-embedded: a chunk's id is made from its
+heading path and the hash of its text (see `section_key`), so a section that comes out
+the same keeps its id and its row. Chunks belonging to posts (or sections) that have
+been deleted are removed from the collection.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import os
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence, cast
+
+import mistune
+
+import frontmatter
+from metrics import count, timer
+from postchunker import ASTCache, extract_sections, iter_chunks, section_text
+from .manifest import Manifest
+from .pipeline import IngestPipeline
+
+__all__ = [
+    "IncrementalIndexer",
+    "should_process_file",
+    "iter_posts",
+    "content_hash",
+    "chunk_post",
+    "section_key",
+    "post_metadata",
+    "parse_job",
+    "parse_markdown",
+]
+
+# frontmatter copied into every chunk's metadata, for filtered searches
+FIELDS = ("tags", "categories", "date", "draft")
+
+# See the notes in search.py, the `None` renderer returns the AST
+markdown = mistune.create_markdown(renderer=None, plugins=["footnotes"])
+
+# one per cache directory, per process (the pipeline's workers each get their own)
+_ast_caches: dict[str, ASTCache] = {}
+
+
+def parse_markdown(content: str, ast_cache: str | None = None) -> list[dict[str, Any]]:
+    """
+    The AST for a post's content, going through the AST cache in `ast_cache` if it's set.
+    """
+    if ast_cache is None:
+        return cast(list[dict[str, Any]], markdown(content))
+    cache = _ast_caches.get(ast_cache)
+    if cache is None:
+        cache = _ast_caches[ast_cache] = ASTCache(ast_cache)
+    return cache.parse(content)
+
+
+def should_process_file(filepath: Path) -> bool:
+    if any(part.startswith(".") for part in filepath.parts):
+        return False
+    if filepath.suffix.lower() not in (".md", ".markdown"):
+        return False
+    return True
+
+
+def iter_posts(root: Path) -> Iterator[Path]:
+    """
+    Yield the markdown files under `root`, in a stable order. Hidden directories are
+    skipped without being walked.
+    """
+    return frontmatter.iter_files(root, ("*.md", "*.markdown"))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def section_key(section: dict[str, Any]) -> str:
+    """
+    Identifies a section by its heading path and its text, with whitespace collapsed so
+    that re-wrapping a paragraph doesn't count as a change.
+    """
+    text = " ".join("".join(section["content"]).split())
+    key = "\x1f".join(section["headings"]) + "\x00" + text
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def section_ids(rel: str, sections: list[dict[str, Any]]) -> list[str]:
+    """
+    `rel#key` for each section, with a counter on the end of repeated sections.
+    """
+    ids = []
+    seen: dict[str, int] = {}
+    for section in sections:
+        id = f"{rel}#{section_key(section)}"
+        n = seen[id] = seen.get(id, 0) + 1
+        ids.append(id if n == 1 else f"{id}-{n}")
+    return ids
+
+
+def _metadata_value(value: Any, scalars: bool = True) -> Any:
+    # Chroma only takes scalars: lists are joined, dates written as ISO strings
+    if isinstance(value, (list, tuple)):
+        if not scalars:
+            return [_metadata_value(item) for item in value]
+        return ", ".join(str(item) for item in value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def post_metadata(
+    rel: str,
+    metadata: dict[str, object],
+    fields: Sequence[str] = FIELDS,
+    scalars: bool = True,
+) -> dict[str, Any]:
+    """
+    The metadata every chunk of a post gets: its path, title, section (the top-level
+    directory, as Hugo has it) and the frontmatter `fields` it has. `draft` is always
+    set, since a post without it isn't a draft.
+
+    With `scalars` (for Chroma) lists such as tags are joined into one string, which
+    a tag with a comma in it doesn't survive; without it they're kept as lists, which
+    the `VectorStore` stores and filters on as they are.
+    """
+    result: dict[str, Any] = {
+        "path": rel,
+        "title": str(metadata.get("title", "")),
+        "section": rel.split("/", 1)[0] if "/" in rel else "",
+    }
+    for field in fields:
+        value = metadata.get(field)
+        if value is not None:
+            result[field] = _metadata_value(value, scalars)
+    if "draft" in fields:
+        result["draft"] = metadata.get("draft") in (True, "true", "True")
+    return result
+
+
+def chunk_post(
+    data: bytes, ast_cache: str | None = None, **chunking: int
+) -> tuple[frontmatter.Post, list[dict[str, Any]]]:
+    """
+    Parse a post's bytes and split it into sections. If any `chunking` options are given
+    (`max_tokens`, `overlap`, `min_tokens`) the post is split with `iter_chunks` instead.
+    `ast_cache` is an `ASTCache` directory.
+    """
+    # split and loaded separately (rather than `frontmatter.loads`) to time the YAML or
+    # TOML loader on its own
+    with timer("frontmatter.split"):
+        handler, fm, content = frontmatter.split(data)
+    metadata: dict[str, object] = {}
+    if handler is not None and fm is not None:
+        with timer("frontmatter.load"):
+            loaded = handler.load(fm)
+        if isinstance(loaded, dict):
+            metadata = loaded
+    post = frontmatter.Post(content, handler, **metadata)
+
+    title = str(post.get("title", ""))
+    headings = [title] if title else []
+    with timer("markdown"):
+        nodes = parse_markdown(post.content, ast_cache)
+    with timer("chunk"):
+        if chunking:
+            sections = list(iter_chunks(nodes, headings=headings, **chunking))
+        else:
+            sections = extract_sections(nodes, headings=headings)
+    return post, sections
+
+
+def parse_job(
+    data: bytes, ast_cache: str | None = None, **chunking: int
+) -> tuple[dict[str, object], list[dict[str, Any]]]:
+    """
+    The work done in the pipeline's worker processes. Only the metadata and sections are
+    sent back to the parent, not the Post.
+    """
+    post, sections = chunk_post(data, ast_cache, **chunking)
+    return post.metadata, sections
+
+
+class IncrementalIndexer(object):
+    """
+    Keeps a collection in sync with a content directory.
+
+    `collection` is a Chroma collection, or anything with the same `upsert(ids=,
+    documents=, metadatas=, embeddings=)` and `delete(ids=)` methods. Chunks are
+    identified by stable section ids (`section_ids`: the post's path and a hash of each
+    section's headings and text), so only new and changed sections are written and only
+    the ids of sections that are gone are deleted. A collection with a `replace(delete,
+    ids, ...)` method (the `VectorStore`) does both in one step; otherwise the new chunks
+    are upserted before the leftover old ones are deleted, so a post never disappears
+    from results while it's being re-indexed. If `embed` is set (for example
+    `SemanticSearch.embed_sections`) the embeddings are computed here and passed along
+    with the chunks, otherwise the collection's embedding function is used.
+
+    `chunking` is passed to `chunk_post`. It's recorded in the manifest, and changing it
+    re-indexes everything; set `ast_cache` to a directory to keep the parsed markdown
+    around, so that doesn't mean parsing every post again.
+
+    `fields` are the frontmatter fields copied into the chunks' metadata (see
+    `post_metadata`), which `VectorStore.query(where=)` filters on. Lists (tags,
+    categories) are kept as lists for a collection with `replace`, and joined into
+    strings for any other, since Chroma only stores scalars. When a post's metadata
+    changes its chunks are rewritten, even the ones whose text hasn't.
+
+    >>> indexer = IncrementalIndexer(postspath, collection, "./index_manifest.json")
+    >>> indexer.run()
+    {'scanned': 1204, 'unchanged': 1203, 'updated': 1, 'added': 0, 'removed': 0, 'chunks': 7}
+    """
+
+    def __init__(
+        self,
+        root: str | os.PathLike[str],
+        collection: Any,
+        manifest_path: str | os.PathLike[str] = "./index_manifest.json",
+        embed: Callable[[list[str]], Any] | None = None,
+        chunking: dict[str, int] | None = None,
+        ast_cache: str | None = None,
+        fields: Sequence[str] = FIELDS,
+    ) -> None:
+        self.root = Path(root)
+        self.collection = collection
+        self.embed = embed
+        self.chunking = chunking or {}
+        self.ast_cache = ast_cache
+        self.fields = list(fields)
+        # the VectorStore takes lists, Chroma doesn't
+        self.scalars = not hasattr(collection, "replace")
+        self.manifest = Manifest(manifest_path)
+
+    def run(
+        self,
+        full: bool = False,
+        workers: int | None = 1,
+        batch_size: int = 64,
+    ) -> dict[str, int]:
+        """
+        Index new and changed posts, and remove deleted ones. With `full=True` every post
+        is re-indexed regardless of what the manifest says.
+
+        Parsing and chunking run on `workers` processes (`None` uses every core); the
+        results are written to the collection in batches of `batch_size` posts.
+        """
+        stats = {
+            "scanned": 0,
+            "unchanged": 0,
+            "updated": 0,
+            "added": 0,
+            "removed": 0,
+            "chunks": 0,
+        }
+        seen: set[str] = set()
+        # re-embed every section, not just the changed ones (after changing the model)
+        rewrite = full
+        if self.manifest.options.get("chunking", {}) != self.chunking:
+            full = True
+        if self.manifest.options.get("fields") != self.fields:
+            # every post's metadata changes (or was written without the fields)
+            full = True
+        pipeline = IngestPipeline(
+            partial(parse_job, ast_cache=self.ast_cache, **self.chunking),
+            workers=workers,
+            batch_size=batch_size,
+            label=lambda context: context[0],
+        )
+
+        try:
+            changed = self.scan(full, seen, stats)
+            for batch in pipeline.batches(changed):
+                stats["chunks"] += self.write_batch(batch, rewrite)
+
+            for rel in [rel for rel in self.manifest if rel not in seen]:
+                self.remove_post(rel)
+                stats["removed"] += 1
+            # only once every post has been re-chunked
+            self.manifest.options["chunking"] = self.chunking
+            self.manifest.options["fields"] = self.fields
+        finally:
+            # whatever was written before a failure is still recorded correctly
+            self.manifest.save()
+
+        return stats
+
+    def scan(
+        self, full: bool, seen: set[str], stats: dict[str, int]
+    ) -> Iterator[tuple[tuple[str, os.stat_result, str], bytes]]:
+        """
+        Walk the content directory and yield `((rel, stat, hash), data)` for each post
+        that needs to be indexed. Every path found is added to `seen`.
+        """
+        for path in iter_posts(self.root):
+            rel = path.relative_to(self.root).as_posix()
+            seen.add(rel)
+            job = self._check(path, rel, full, stats)
+            if job is not None:
+                yield job
+
+    def _check(
+        self, path: Path, rel: str, full: bool, stats: dict[str, int]
+    ) -> tuple[tuple[str, os.stat_result, str], bytes] | None:
+        """
+        `((rel, stat, hash), data)` if the post needs to be indexed, otherwise None.
+        """
+        stats["scanned"] += 1
+        stat = path.stat()
+        if not full and self.manifest.is_fresh(rel, stat):
+            stats["unchanged"] += 1
+            return None
+
+        # mtime can change without the content changing (git checkout, touch)
+        data = path.read_bytes()
+        digest = content_hash(data)
+        entry = self.manifest.get(rel)
+        if not full and entry is not None and entry["hash"] == digest:
+            self.manifest.touch(rel, stat)
+            stats["unchanged"] += 1
+            return None
+
+        stats["updated" if entry is not None else "added"] += 1
+        return (rel, stat, digest), data
+
+    def update(self, paths: Iterable[str]) -> dict[str, int]:
+        """
+        Re-index only the given posts (paths relative to the root), without scanning the
+        rest of the directory: the ones that changed are re-indexed, the ones that are
+        gone are removed. A directory stands for every post in it, or every post that
+        was in it if it's gone. Used by the `Watcher`.
+
+        The chunking options have to match the manifest's; after changing them, `run`
+        re-indexes everything.
+        """
+        stats = {
+            "scanned": 0,
+            "unchanged": 0,
+            "updated": 0,
+            "added": 0,
+            "removed": 0,
+            "chunks": 0,
+        }
+        targets: set[str] = set()
+        for rel in paths:
+            rel = rel.strip("/")
+            targets.add(rel)
+            prefix = rel + "/" if rel else ""
+            targets.update(post for post in self.manifest if post.startswith(prefix))
+            directory = self.root / rel
+            if directory.is_dir():
+                targets.update(
+                    path.relative_to(self.root).as_posix()
+                    for path in iter_posts(directory)
+                )
+
+        batch = []
+        try:
+            for rel in sorted(targets):
+                path = self.root / rel
+                if should_process_file(Path(rel)) and path.is_file():
+                    job = self._check(path, rel, False, stats)
+                    if job is not None:
+                        context, data = job
+                        batch.append(
+                            (context, parse_job(data, self.ast_cache, **self.chunking))
+                        )
+                elif rel in self.manifest:
+                    self.remove_post(rel)
+                    stats["removed"] += 1
+            if batch:
+                stats["chunks"] += self.write_batch(batch)
+        finally:
+            self.manifest.save()
+        return stats
+
+    def index_post(
+        self, rel: str, stat: os.stat_result, data: bytes, digest: str
+    ) -> int:
+        """
+        Replace the chunks of a single post. Returns the number of chunks written.
+        """
+        return self.write_batch(
+            [((rel, stat, digest), parse_job(data, self.ast_cache, **self.chunking))]
+        )
+
+    def write_batch(
+        self,
+        batch: list[
+            tuple[
+                tuple[str, os.stat_result, str],
+                tuple[dict[str, object], list[dict[str, Any]]],
+            ]
+        ],
+        rewrite: bool = False,
+    ) -> int:
+        """
+        Bring the chunks of a batch of parsed posts up to date with one `replace` (or one
+        `upsert` and one `delete`): new and changed sections are embedded and written,
+        sections that are gone are deleted, and the rest are left alone unless
+        `rewrite` is set. Returns the number of chunks written.
+        """
+        stale: list[str] = []
+        ids: list[str] = []
+        documents: list[str] = []
+        metadatas: list[dict[str, Any]] = []
+        entries: dict[str, dict[str, Any]] = {}
+
+        kept = 0
+
+        for (rel, stat, digest), (metadata, sections) in batch:
+            entry = self.manifest.get(rel)
+            old = entry["chunk_ids"] if entry is not None else []
+            shared = post_metadata(rel, metadata, self.fields, self.scalars)
+            post_ids = section_ids(rel, sections)
+            current = set(post_ids)
+            stale.extend(id for id in old if id not in current)
+
+            # unchanged sections keep their rows, unless their metadata has changed
+            unchanged = entry is not None and entry.get("metadata") == shared
+            existing = set(old) if unchanged and not rewrite else set()
+            for id, section in zip(post_ids, sections):
+                if id in existing:
+                    kept += 1
+                    continue
+                ids.append(id)
+                documents.append(section_text(section))
+                metadatas.append(
+                    dict(shared, headings=" > ".join(section["headings"]))
+                )
+
+            entries[rel] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "chunk_ids": post_ids,
+                "metadata": shared,
+            }
+
+        embeddings = None
+        if ids and self.embed is not None:
+            with timer("embed"):
+                embeddings = self.embed(documents)
+        replace = getattr(self.collection, "replace", None)
+        if replace is not None and embeddings is not None:
+            with timer("collection.replace"):
+                replace(
+                    stale,
+                    ids=ids,
+                    embeddings=embeddings,
+                    documents=documents,
+                    metadatas=metadatas,
+                )
+        else:
+            if ids:
+                with timer("collection.upsert"):
+                    if embeddings is not None:
+                        self.collection.upsert(
+                            ids=ids,
+                            documents=documents,
+                            metadatas=metadatas,
+                            embeddings=embeddings,
+                        )
+                    else:
+                        self.collection.upsert(
+                            ids=ids, documents=documents, metadatas=metadatas
+                        )
+            if stale:
+                with timer("collection.delete"):
+                    self.collection.delete(ids=stale)
+        count("posts.written", len(entries))
+        count("chunks.written", len(ids))
+        count("chunks.kept", kept)
+        # only record the posts once they've been written
+        for rel, entry in entries.items():
+            self.manifest[rel] = entry
+        return len(ids)
+
+    def remove_post(self, rel: str) -> None:
+        entry = self.manifest[rel]
+        if entry["chunk_ids"]:
+            self.collection.delete(ids=entry["chunk_ids"])
+        del self.manifest[rel]
@@ -0,0 +1,273 @@
+"""
+Keep an index up to date while posts are being edited.
+
+A `Watcher` waits for changes under the content directory and re-indexes only the posts
+that were touched (`IncrementalIndexer.update`), once they've been quiet for `debounce`
+seconds: an editor saving a file can produce several events, and a `git pull` a burst of
+them, which end up as one update.
+
+On Linux the changes come from inotify; elsewhere, or with `poll=True`, the directory's
+mtimes and sizes are compared every `poll_interval` seconds, which stats every post but
+reads only the ones that changed.
+
+>>> watcher = Watcher(indexer, debounce=0.5)
+>>> watcher.run()  # until interrupted
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Union
+
+from .postindexer import IncrementalIndexer, iter_posts
+
+__all__ = ["Watcher", "InotifySource", "PollingSource"]
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+_event = struct.Struct("iIII")
+
+
+class InotifySource(object):
+    """
+    Changes reported by inotify. Every directory under the root (except hidden ones) is
+    watched, and directories created later are added as they appear.
+    """
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.root = Path(root)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        # watch descriptor -> directory, relative to the root ("" for the root)
+        self._dirs: dict[int, str] = {}
+        self._add_tree(self.root)
+
+    def _add_tree(self, directory: Path) -> None:
+        for dirpath, dirnames, _ in os.walk(directory):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            self._add(Path(dirpath))
+
+    def _add(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), _MASK | IN_ONLYDIR
+        )
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code in (errno.ENOENT, errno.ENOTDIR):  # gone again already
+                return
+            raise OSError(code, os.strerror(code), str(directory))
+        rel = directory.relative_to(self.root).as_posix()
+        self._dirs[wd] = "" if rel == "." else rel
+
+    def changes(self, timeout: float) -> set[str] | None:
+        """
+        Wait up to `timeout` seconds and return the paths (relative to the root) that
+        changed, or None if the kernel's queue overflowed and changes were lost.
+        """
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        changed: set[str] = set()
+        if not readable:
+            return changed
+        data = b""
+        while True:
+            try:
+                data += os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+        offset = 0
+        overflow = False
+        while offset < len(data):
+            wd, mask, _, length = _event.unpack_from(data, offset)
+            offset += _event.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue  # reported by the parent directory
+            if name.startswith("."):
+                continue
+            rel = f"{directory}/{name}" if directory else name
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(self.root / rel)
+            changed.add(rel)
+        return None if overflow else changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingSource(object):
+    """
+    Changes found by comparing every post's mtime and size every `interval` seconds.
+    """
+
+    def __init__(self, root: str | os.PathLike[str], interval: float = 1.0) -> None:
+        self.root = Path(root)
+        self.interval = interval
+        self._seen = self._snapshot()
+        self._next = time.monotonic() + interval
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in iter_posts(self.root):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            rel = path.relative_to(self.root).as_posix()
+            snapshot[rel] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def changes(self, timeout: float) -> set[str] | None:
+        """
+        The paths that changed since the last poll, if it's time for the next one within
+        `timeout` seconds; otherwise wait `timeout` and return nothing.
+        """
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(timeout, 0))
+            return set()
+        time.sleep(max(wait, 0))
+        self._next = time.monotonic() + self.interval
+
+        snapshot = self._snapshot()
+        changed = {rel for rel in self._seen if rel not in snapshot}
+        changed.update(
+            rel for rel, seen in snapshot.items() if self._seen.get(rel) != seen
+        )
+        self._seen = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+Source = Union[InotifySource, PollingSource]
+
+
+class Watcher(object):
+    """
+    Re-indexes posts as they change. `on_update` is called with the stats of every
+    update (see `IncrementalIndexer.update`), after the manifest has been saved.
+
+    The indexer is brought up to date with a normal `run` when watching starts, so
+    changes made while nothing was watching aren't missed; after that only touched posts
+    are looked at, unless inotify's queue overflowed, which also means a `run`.
+    """
+
+    def __init__(
+        self,
+        indexer: IncrementalIndexer,
+        debounce: float = 0.5,
+        poll: bool = False,
+        poll_interval: float = 1.0,
+        on_update: Callable[[dict[str, int]], None] | None = None,
+    ) -> None:
+        self.indexer = indexer
+        self.debounce = debounce
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.on_update = on_update
+        self.stopped = threading.Event()
+
+    def _source(self) -> Source:
+        if not self.poll:
+            try:
+                return InotifySource(self.indexer.root)
+            except (OSError, AttributeError):
+                pass  # not Linux, or out of watches
+        return PollingSource(self.indexer.root, self.poll_interval)
+
+    def stop(self) -> None:
+        """
+        Make `run` return, from another thread or a signal handler.
+        """
+        self.stopped.set()
+
+    def run(self, workers: int | None = 1) -> None:
+        """
+        Watch until `stop` is called. `workers` is used for the initial `run`.
+        """
+        source = self._source()
+        try:
+            self._report(self.indexer.run(workers=workers))
+            # path -> when it last changed
+            pending: dict[str, float] = {}
+            while not self.stopped.is_set():
+                now = time.monotonic()
+                if pending:
+                    timeout = min(pending.values()) + self.debounce - now
+                else:
+                    timeout = self.poll_interval
+                changed = source.changes(min(timeout, self.poll_interval))
+
+                now = time.monotonic()
+                if changed is None:
+                    pending.clear()
+                    self._report(self.indexer.run(workers=workers))
+                    continue
+                for rel in changed:
+                    pending[rel] = now
+
+                ready = [rel for rel, t in pending.items() if now - t >= self.debounce]
+                if ready:
+                    for rel in ready:
+                        del pending[rel]
+                    self._report(self.indexer.update(ready))
+        finally:
+            source.close()
+
+    def _report(self, stats: dict[str, int]) -> None:
+        if self.on_update is not None:
+            self.on_update(stats)
@@ -1,52 +1,131 @@
-import frontmatter
-from frontmatter import Post
-from postchunker import extract_sections
+# Heavy imports (mistune, the frontmatter parsers, the model) happen inside the functions
+# that need them, so `--help` and `--query` don't pay for the parsing stack.
+# `python -m semantic_search` is the full command line; this script is kept for the
+# debugging helpers.
+import argparse
 from pathlib import Path
-from typing import cast, Any
-import mistune
+from typing import TYPE_CHECKING, cast, Any
 
-postspath = "/home/scossar/projects/zalgorithm/content"
-# To generate an AST, call with `markdown(post.content)`
-# See https://github.com/lepture/mistune/blob/4adac1c6e7e14e7deeb1bf6c6cd8c6816f537691/docs/renderers.rst#L56
-# for the list of available methods (list of nodes that will be generated)
-markdown = mistune.create_markdown(
-    renderer=None, plugins=["footnotes"]
-)  # Creates an AST renderer
+import metrics
+
+if TYPE_CHECKING:
+    from frontmatter import Post
 
+postspath = "/home/scossar/projects/zalgorithm/content"
 
-def should_process_file(filepath: Path) -> bool:
-    if any(part.startswith(".") for part in filepath.parts):
-        print("starts with .")
-        return False
-    if filepath.suffix.lower() not in (".md", ".markdown"):
-        return False
-    return True
 
+def load_file(filepath: Path) -> "Post":
+    import frontmatter
 
-def load_file(filepath: Path) -> Post:
     post = frontmatter.load(filepath)
     return post
 
 
-for path in Path(postspath).rglob("*"):
-    if not should_process_file(path):
-        continue
-    stem = path.stem
+def print_sections(stem_name: str) -> None:
+    import mistune
+
+    from postchunker import extract_sections
+    from postindexer import should_process_file
+
+    # To generate an AST, call with `markdown(post.content)`
+    # See https://github.com/lepture/mistune/blob/4adac1c6e7e14e7deeb1bf6c6cd8c6816f537691/docs/renderers.rst#L56
+    # for the list of available methods (list of nodes that will be generated)
+    markdown = mistune.create_markdown(
+        renderer=None, plugins=["footnotes"]
+    )  # Creates an AST renderer
+
+    for path in Path(postspath).rglob("*"):
+        if not should_process_file(path):
+            continue
+        stem = path.stem
+        if stem == stem_name:
+            post = load_file(path)
+            title = str(post["title"])  # it's a string
+            nodes = markdown(post.content)
+            nodes = cast(list[dict[str, Any]], nodes)
+            # From `markdown.py`, the __call__(self, s: str) method calls `self.parse(s)[0]`
+            # The return type is `Union[str, List[Dict[str, Any]]]`, but for the "None" renderer
+            # the returned type will be `List[Dict[str, Any]]`
+            # for node in nodes[:25]:
+            #     print(node)
+            #     print("\n")
+            sections = extract_sections(nodes, headings=[title])
+            for section in sections:
+                print(section)
+                print("\n")
+
+
+def index(full: bool = False, workers: int | None = 1, backend: str = "local") -> None:
+    from semantic_search.cli import index as index_posts
+
+    print(index_posts(postspath, "./", full=full, workers=workers, backend=backend))
+
+
+def watch(backend: str = "local", poll: bool = False) -> None:
+    from semantic_search.cli import watch as watch_posts
+
+    watch_posts(postspath, "./", poll=poll, backend=backend)
+
+
+def query(text: str, n_results: int = 5) -> None:
+    from semantic_search.cli import print_hits, query as search
+
+    print_hits(search(text, "./", n_results=n_results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--index", action="store_true", help="index new and changed posts"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="index, then re-index posts as they're edited, until interrupted",
+    )
+    parser.add_argument(
+        "--poll", action="store_true", help="with --watch, poll instead of inotify"
+    )
+    parser.add_argument("--query", help="search the local index")
+    parser.add_argument(
+        "--full", action="store_true", help="with --index, re-index every post"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="with --index, number of parser processes (default: one per core)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["local", "chroma"],
+        default="local",
+        help="with --index or --watch, where to write the chunks",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="write stage timings to this file (Prometheus text for .prom, else JSON)",
+    )
+    parser.add_argument(
+        "--slow-log", help="with --metrics, log posts slower than --slow-threshold here"
+    )
+    parser.add_argument("--slow-threshold", type=float, default=0.5)
     # testing
     # stem_name = "chunking_hugo_post_content_for_semantic_search"
-    stem_name = "roger-bacon-as-magician"
-    if stem == stem_name:
-        post = load_file(path)
-        title = str(post["title"])  # it's a string
-        nodes = markdown(post.content)
-        nodes = cast(list[dict[str, Any]], nodes)
-        # From `markdown.py`, the __call__(self, s: str) method calls `self.parse(s)[0]`
-        # The return type is `Union[str, List[Dict[str, Any]]]`, but for the "None" renderer
-        # the returned type will be `List[Dict[str, Any]]`
-        # for node in nodes[:25]:
-        #     print(node)
-        #     print("\n")
-        sections = extract_sections(nodes, headings=[title])
-        for section in sections:
-            print(section)
-            print("\n")
+    parser.add_argument("--stem", default="roger-bacon-as-magician")
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable(slow_log=args.slow_log, slow_threshold=args.slow_threshold)
+    try:
+        if args.index:
+            index(full=args.full, workers=args.workers, backend=args.backend)
+        elif args.watch:
+            watch(backend=args.backend, poll=args.poll)
+        elif args.query:
+            query(args.query)
+        else:
+            print_sections(args.stem)
+    finally:
+        if args.metrics:
+            metrics.registry.write(args.metrics)
@@ -0,0 +1,57 @@
+"""
+The package's names are imported from their modules on first use, so that importing one
+part (say `VectorStore`, for a query process) doesn't import all the others.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .aio import AsyncSearch
+    from .ann import IVFIndex
+    from .embedding_cache import EmbeddingCache, text_key
+    from .filters import MetadataIndex
+    from .lexical import LexicalIndex, tokenize
+    from .reduction import Projection
+    from .semantic_search import SemanticSearch
+    from .service import QueryBatcher, QueryService, serve
+    from .shards import ShardedScorer
+    from .vector_store import VectorStore
+    from .writer import BulkWriter, Chunk, chunk_id
+
+_modules = {
+    "SemanticSearch": ".semantic_search",
+    "AsyncSearch": ".aio",
+    "QueryService": ".service",
+    "QueryBatcher": ".service",
+    "serve": ".service",
+    "EmbeddingCache": ".embedding_cache",
+    "VectorStore": ".vector_store",
+    "ShardedScorer": ".shards",
+    "BulkWriter": ".writer",
+    "Chunk": ".writer",
+    "chunk_id": ".writer",
+    "IVFIndex": ".ann",
+    "Projection": ".reduction",
+    "LexicalIndex": ".lexical",
+    "MetadataIndex": ".filters",
+    "text_key": ".embedding_cache",
+    "tokenize": ".lexical",
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name: str) -> Any:
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
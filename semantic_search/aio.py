@@ -0,0 +1,194 @@
+"""
+asyncio support for SemanticSearch.
+
+A web frontend runs many searches at once. Embedding them one at a time wastes most of
+each forward pass, so `AsyncSearch` collects the searches that arrive while one batch is
+running (or within `max_wait` seconds of the first) and runs them together: one encode
+call for the batch, and one matrix product against the store. Searches for the same
+query that are already in flight share a single result rather than being run twice.
+
+The work runs on a single worker thread, so the event loop is never blocked by the model.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .semantic_search import SemanticSearch
+
+__all__ = ["AsyncSearch"]
+
+# (query, n_results, mode)
+Key = tuple[str, int, str]
+
+
+class AsyncSearch(object):
+    """
+    >>> searcher = AsyncSearch(search)
+    >>> hits = await searcher.search("roger bacon", n_results=5)
+    >>> searcher.stats()["latency_ms"]
+    {'p50': 11.2, 'p90': 14.9, 'p99': 21.0}
+
+    Usually used through `SemanticSearch.asearch`.
+    """
+
+    def __init__(
+        self,
+        search: SemanticSearch,
+        max_batch: int = 64,
+        max_wait: float = 0.002,
+        history: int = 10000,
+    ) -> None:
+        self.engine = search
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        # one thread: batches run in order, and queries arriving meanwhile join the next
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: dict[Key, asyncio.Future[list[dict[str, Any]]]] = {}
+        self._in_flight: dict[Key, asyncio.Future[list[dict[str, Any]]]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._running = False
+
+        self.latencies: deque[float] = deque(maxlen=history)
+        self.batch_sizes: deque[int] = deque(maxlen=history)
+        self.searches = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    async def search(
+        self, query: str, n_results: int = 10, mode: str = "hybrid"
+    ) -> list[dict[str, Any]]:
+        if mode not in ("vector", "lexical", "hybrid"):
+            raise ValueError(f"Unknown search mode {mode!r}")
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # futures belong to a loop; anything left from another loop can't be awaited
+            self._loop = loop
+            self._pending.clear()
+            self._in_flight.clear()
+            self._timer = None
+            self._running = False
+
+        self.searches += 1
+        key = (" ".join(query.split()), n_results, mode)
+        future = self._pending.get(key) or self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = loop.create_future()
+            self._pending[key] = future
+            self._schedule()
+        try:
+            # shielded, so one caller being cancelled doesn't cancel the others' result
+            return await asyncio.shield(future)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def _schedule(self) -> None:
+        if self._running:
+            return  # picked up when the running batch finishes
+        assert self._loop is not None
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.max_wait, self._flush)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running or not self._pending:
+            return
+        keys = list(self._pending)[: self.max_batch]
+        batch = {key: self._pending.pop(key) for key in keys}
+        self._in_flight.update(batch)
+        self._running = True
+        self.batches += 1
+        self.batch_sizes.append(len(batch))
+        assert self._loop is not None
+        task = self._loop.run_in_executor(self._executor, self._run, keys)
+        task.add_done_callback(lambda done: self._finish(batch, done))
+
+    def _run(self, keys: list[Key]) -> list[list[dict[str, Any]]]:
+        """
+        Runs on the worker thread. All the queries that need an embedding are encoded
+        together, then each (n_results, mode) group is scored in one call.
+        """
+        engine = self.engine
+        texts = list(dict.fromkeys(query for query, _, mode in keys if mode != "lexical"))
+        embedded = engine.embed_queries(texts) if texts else None
+        position = {text: i for i, text in enumerate(texts)}
+
+        groups: dict[tuple[int, str], list[int]] = {}
+        for i, (_, n_results, mode) in enumerate(keys):
+            groups.setdefault((n_results, mode), []).append(i)
+
+        results: list[list[dict[str, Any]]] = [[] for _ in keys]
+        for (n_results, mode), indexes in groups.items():
+            queries = [keys[i][0] for i in indexes]
+            embeddings = None
+            if embedded is not None and mode != "lexical":
+                embeddings = embedded[[position[query] for query in queries]]
+            hits = engine.search_many(queries, n_results, mode, embeddings=embeddings)
+            for i, query_hits in zip(indexes, hits):
+                results[i] = query_hits
+        return results
+
+    def _finish(
+        self,
+        batch: dict[Key, asyncio.Future[list[dict[str, Any]]]],
+        done: asyncio.Future[list[list[dict[str, Any]]]],
+    ) -> None:
+        for key in batch:
+            self._in_flight.pop(key, None)
+        error = done.exception()
+        results = None if error is not None else done.result()
+        for i, future in enumerate(batch.values()):
+            if future.done():
+                continue
+            if results is None:
+                assert error is not None
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+        self._running = False
+        if self._pending:
+            self._flush()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Latency percentiles (milliseconds, over the most recent searches), and the
+        number of distinct queries per batch.
+        """
+        stats: dict[str, Any] = {
+            "searches": self.searches,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+        }
+        if self.latencies:
+            p50, p90, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 90, 99])
+            stats["latency_ms"] = {
+                "p50": round(float(p50), 3),
+                "p90": round(float(p90), 3),
+                "p99": round(float(p99), 3),
+            }
+        if self.batch_sizes:
+            sizes = np.array(self.batch_sizes)
+            stats["batch_size"] = {
+                "mean": round(float(sizes.mean()), 2),
+                "p50": float(np.percentile(sizes, 50)),
+                "max": int(sizes.max()),
+            }
+        return stats
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,169 @@
+"""
+An inverted file (IVF) index for approximate nearest neighbour search, in plain NumPy.
+
+The vectors are clustered with spherical k-means. Each row of the vector store is filed
+under its closest centroid, and a query only scores the rows in its `nprobe` closest
+clusters. `nprobe` is the recall/latency knob: `nprobe=n_lists` is exact search, small
+values look at a small fraction of the corpus.
+
+The index only holds row numbers; the vectors themselves stay in the store's memory map.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+__all__ = ["IVFIndex"]
+
+# assign rows to centroids this many at a time, to bound the size of the score matrix
+ASSIGN_BLOCK = 65536
+
+
+def assign(
+    vectors: npt.NDArray[np.float32], centroids: npt.NDArray[np.float32]
+) -> npt.NDArray[np.int32]:
+    """
+    The index of the closest centroid (by cosine) for each row.
+    """
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start : start + ASSIGN_BLOCK])
+        labels[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(
+    vectors: npt.NDArray[np.float32],
+    n_lists: int,
+    iterations: int = 20,
+    sample_size: int | None = None,
+    seed: int = 0,
+) -> npt.NDArray[np.float32]:
+    """
+    Spherical k-means on (a sample of) normalized vectors.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = sample_size or n_lists * 256
+    if len(vectors) > sample_size:
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, False))])
+    else:
+        sample = np.asarray(vectors)
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        # an empty cluster gets a random point, rather than collapsing to zero
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex(object):
+    """
+    >>> ivf = IVFIndex.train(store.vectors(), n_lists=256)
+    >>> ivf.add(np.arange(len(store.vectors())), store.vectors())
+    >>> rows = ivf.candidates(query_vector, nprobe=8)
+    """
+
+    def __init__(self, centroids: npt.NDArray[np.float32]) -> None:
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.lists: list[npt.NDArray[np.int64]] = [
+            np.zeros(0, dtype=np.int64) for _ in range(len(self.centroids))
+        ]
+        self.count = 0  # the number of store rows that have been filed
+
+    @classmethod
+    def train(
+        cls,
+        vectors: npt.NDArray[np.float32],
+        n_lists: int | None = None,
+        iterations: int = 20,
+        seed: int = 0,
+    ) -> IVFIndex:
+        if n_lists is None:
+            # the usual rule of thumb, a few times the square root of the corpus size
+            n_lists = max(1, int(4 * np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        return cls(train_centroids(vectors, n_lists, iterations, seed=seed))
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def add(
+        self, rows: npt.NDArray[np.int64], vectors: npt.NDArray[np.float32]
+    ) -> None:
+        """
+        File new rows under their closest centroid. The centroids aren't retrained, so
+        after the corpus has changed a lot it's worth calling `train` again.
+        """
+        if len(rows) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        labels = assign(vectors, self.centroids)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.n_lists + 1))
+        for i in np.unique(labels):
+            new = rows[order[bounds[i] : bounds[i + 1]]]
+            self.lists[i] = np.concatenate([self.lists[i], new])
+        self.count = max(self.count, int(rows.max()) + 1)
+
+    def candidates(
+        self, query: npt.NDArray[np.float32], nprobe: int = 8
+    ) -> npt.NDArray[np.int64]:
+        """
+        The rows in the `nprobe` clusters closest to a (normalized) query vector.
+        """
+        nprobe = min(max(nprobe, 1), self.n_lists)
+        scores = self.centroids @ query
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[i] for i in probe])
+
+    def remap(self, keep: npt.NDArray[np.int64]) -> None:
+        """
+        Renumber the rows after the store has been compacted down to the rows in `keep`.
+        """
+        new_rows = np.full(self.count, -1, dtype=np.int64)
+        keep = keep[keep < self.count]
+        new_rows[keep] = np.arange(len(keep))
+        for i, rows in enumerate(self.lists):
+            mapped = new_rows[rows]
+            self.lists[i] = mapped[mapped >= 0]
+        self.count = len(keep)
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        lengths = np.array([len(rows) for rows in self.lists], dtype=np.int64)
+        path = Path(path)
+        tmp = path.with_suffix(".tmp.npz")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                offsets=np.concatenate([[0], np.cumsum(lengths)]),
+                rows=np.concatenate(self.lists) if self.lists else np.zeros(0),
+                count=np.array(self.count),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> IVFIndex:
+        with np.load(path) as data:
+            index = cls(data["centroids"])
+            offsets = data["offsets"]
+            rows = data["rows"].astype(np.int64)
+            index.lists = [
+                rows[offsets[i] : offsets[i + 1]] for i in range(index.n_lists)
+            ]
+            index.count = int(data["count"])
+        return index
@@ -0,0 +1,270 @@
+"""
+Index a content directory and search it from the command line.
+
+    python -m semantic_search index ~/projects/zalgorithm/content
+    python -m semantic_search query "roger bacon" -k 5
+    python -m semantic_search query "roger bacon" --where '{"tags": "history"}'
+    python -m semantic_search stats
+    python -m semantic_search watch ~/projects/zalgorithm/content
+
+Only the standard library is imported up front. Each command imports what it needs when
+it runs: `stats` only reads the store, `query` loads the persisted index (and the model,
+unless the search is lexical) but never the markdown or frontmatter parsers, and only
+`index` loads everything.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from postindexer import IncrementalIndexer
+
+    from .semantic_search import SemanticSearch
+
+__all__ = ["main", "index", "query", "print_hits", "stats", "watch"]
+
+CHUNKING = {"max_tokens": 256, "overlap": 32, "min_tokens": 64}
+DEFAULT_MODEL = "all-mpnet-base-v2"
+
+
+def _indexer(
+    content: str | os.PathLike[str], persist_dir: str, backend: str, model: str
+) -> tuple[IncrementalIndexer, SemanticSearch]:
+    from postindexer import IncrementalIndexer
+
+    from .semantic_search import SemanticSearch
+
+    search = SemanticSearch(model, persist_dir)
+    if backend == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(os.path.join(persist_dir, "chroma"))
+        collection = client.get_or_create_collection(name="posts")
+    else:
+        collection = search.store
+    indexer = IncrementalIndexer(
+        content,
+        collection,
+        os.path.join(persist_dir, "index_manifest.json"),
+        embed=search.embed_sections,
+        chunking=CHUNKING,
+        ast_cache=os.path.join(persist_dir, "ast_cache"),
+    )
+    return indexer, search
+
+
+def index(
+    content: str | os.PathLike[str],
+    persist_dir: str = "./",
+    full: bool = False,
+    workers: int | None = None,
+    backend: str = "local",
+    model: str = DEFAULT_MODEL,
+) -> dict[str, int]:
+    indexer, search = _indexer(content, persist_dir, backend, model)
+    result = indexer.run(full=full, workers=workers)
+    if backend == "local":
+        search.store.save_indexes()
+    return result
+
+
+def watch(
+    content: str | os.PathLike[str],
+    persist_dir: str = "./",
+    debounce: float = 0.5,
+    poll: bool = False,
+    poll_interval: float = 1.0,
+    workers: int | None = None,
+    backend: str = "local",
+    model: str = DEFAULT_MODEL,
+) -> None:
+    """
+    Index the content directory, then keep re-indexing the posts that change until
+    interrupted. Query services using the same store pick the changes up as they happen.
+    """
+    from postindexer import Watcher
+
+    indexer, search = _indexer(content, persist_dir, backend, model)
+
+    def report(result: dict[str, int]) -> None:
+        if result["updated"] or result["added"] or result["removed"]:
+            print(json.dumps(result), flush=True)
+
+    watcher = Watcher(indexer, debounce, poll, poll_interval, on_update=report)
+    try:
+        watcher.run(workers=workers)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if backend == "local":
+            search.store.save_indexes()
+
+
+def query(
+    text: str,
+    persist_dir: str = "./",
+    n_results: int = 5,
+    mode: str = "hybrid",
+    model: str = DEFAULT_MODEL,
+    where: dict[str, Any] | None = None,
+) -> list[dict[str, Any]]:
+    from .semantic_search import SemanticSearch
+
+    return SemanticSearch(model, persist_dir).search(text, n_results, mode, where=where)
+
+
+def print_hits(hits: list[dict[str, Any]]) -> None:
+    """
+    One line per hit: score, id and heading path. Rows written without headings (by the
+    `BulkWriter`, say) just leave them out.
+    """
+    for hit in hits:
+        headings = (hit["metadata"] or {}).get("headings", "")
+        print(f"{hit['score']:.3f}  {hit['id']}  {headings}")
+
+
+def stats(persist_dir: str = "./") -> dict[str, Any]:
+    """
+    What's in the index, without loading the model or the parsers.
+    """
+    from postindexer.manifest import Manifest
+
+    from .vector_store import VectorStore
+
+    store = VectorStore(os.path.join(persist_dir, "vectors"))
+    manifest = Manifest(os.path.join(persist_dir, "index_manifest.json"))
+    return {
+        "posts": len(manifest.entries),
+        "chunks": len(store),
+        "rows_written": store.count,
+        "dim": store.dim,
+        "dtype": store.dtype,
+        "generation": store.generation,
+        "vector_bytes": store.nbytes() if store.dim is not None else 0,
+        "ivf_lists": store.ann.n_lists if store.ann is not None else None,
+        "projection": (
+            f"{store.projection.method}:{store.projection.dim}"
+            if store.projection is not None
+            else None
+        ),
+        "chunking": manifest.options.get("chunking"),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m semantic_search", description="Index and search blog posts."
+    )
+    parser.add_argument(
+        "--persist-dir", default="./", help="where the index and caches are kept"
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--metrics",
+        help="write stage timings to this file (Prometheus text for .prom, else JSON)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="index new and changed posts")
+    index_parser.add_argument("content", help="the content directory")
+    index_parser.add_argument("--full", action="store_true", help="re-index every post")
+    index_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of parser processes (default: one per core)",
+    )
+    index_parser.add_argument(
+        "--backend", choices=["local", "chroma"], default="local"
+    )
+
+    query_parser = commands.add_parser("query", help="search the index")
+    query_parser.add_argument("text")
+    query_parser.add_argument("-k", type=int, default=5, help="number of results")
+    query_parser.add_argument(
+        "--mode", choices=["hybrid", "vector", "lexical"], default="hybrid"
+    )
+    query_parser.add_argument("--json", action="store_true", help="print JSON")
+    query_parser.add_argument(
+        "--where",
+        type=json.loads,
+        help='a frontmatter filter as JSON, e.g. \'{"draft": {"$ne": true}}\'',
+    )
+
+    commands.add_parser("stats", help="describe the index")
+
+    watch_parser = commands.add_parser(
+        "watch", help="index, then re-index posts as they change"
+    )
+    watch_parser.add_argument("content", help="the content directory")
+    watch_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="seconds a post has to be left alone before it's re-indexed",
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="poll for changes instead of using inotify"
+    )
+    watch_parser.add_argument("--poll-interval", type=float, default=1.0)
+    watch_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of parser processes for the first pass (default: one per core)",
+    )
+    watch_parser.add_argument(
+        "--backend", choices=["local", "chroma"], default="local"
+    )
+
+    args = parser.parse_args(argv)
+    if args.metrics:
+        import metrics
+
+        metrics.enable()
+
+    if args.command == "index":
+        result: Any = index(
+            args.content,
+            args.persist_dir,
+            args.full,
+            args.workers,
+            args.backend,
+            args.model,
+        )
+        print(json.dumps(result))
+    elif args.command == "query":
+        hits = query(
+            args.text, args.persist_dir, args.k, args.mode, args.model, args.where
+        )
+        if args.json:
+            print(json.dumps(hits, default=str, indent=2))
+        else:
+            print_hits(hits)
+    elif args.command == "watch":
+        watch(
+            args.content,
+            args.persist_dir,
+            args.debounce,
+            args.poll,
+            args.poll_interval,
+            args.workers,
+            args.backend,
+            args.model,
+        )
+    else:
+        print(json.dumps(stats(args.persist_dir), indent=2))
+
+    if args.metrics:
+        import metrics
+
+        metrics.registry.write(args.metrics)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,166 @@
+"""
+An on-disk cache of chunk embeddings, so that unchanged chunks never go through the model
+again.
+
+Each model gets its own directory with three files:
+- `meta.json`: the embedding dimension
+- `keys.txt`: one text hash per line, line n is the key for row n
+- `vectors.f32`: the raw float32 rows
+
+Both data files are append-only. On load the keys go into a dict and the vectors are
+memory-mapped, so a hit is a dict lookup plus a row read.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+__all__ = ["EmbeddingCache", "text_key"]
+
+_whitespace = re.compile(r"\s+")
+
+
+def text_key(text: str) -> str:
+    """
+    Hash of the normalized text. Whitespace differences don't change the embedding enough
+    to matter, so they don't change the key either.
+    """
+    normalized = _whitespace.sub(" ", text).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache(object):
+    """
+    >>> cache = EmbeddingCache("./embedding_cache", "all-mpnet-base-v2")
+    >>> hits, missing = cache.lookup(keys)
+    >>> cache.add(missing_keys, model.encode(missing_texts))
+    """
+
+    def __init__(self, cache_dir: str | os.PathLike[str], model_name: str) -> None:
+        # model names can contain slashes ("sentence-transformers/all-mpnet-base-v2")
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.dir = Path(cache_dir) / slug
+        self.dim: int | None = None
+        self.rows: dict[str, int] = {}
+        self._vectors: np.memmap | None = None
+        self.load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.dir / "meta.json"
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.dir / "keys.txt"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.f32"
+
+    def load(self) -> None:
+        if not self._meta_path.exists():
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.dim = int(json.load(f)["dim"])
+
+        keys: list[str] = []
+        if self._keys_path.exists():
+            with open(self._keys_path, "r", encoding="utf-8") as f:
+                keys = f.read().split()
+        vector_bytes = (
+            self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        )
+        row_bytes = self.dim * 4
+        n_rows = min(len(keys), vector_bytes // row_bytes)
+
+        # if a previous run died part way through an append, cut both files back to the
+        # rows they agree on, otherwise the next append would be misaligned
+        if vector_bytes != n_rows * row_bytes:
+            os.truncate(self._vectors_path, n_rows * row_bytes)
+        if len(keys) != n_rows:
+            with open(self._keys_path, "w", encoding="utf-8") as f:
+                f.write("".join(key + "\n" for key in keys[:n_rows]))
+
+        self.rows = {key: i for i, key in enumerate(keys[:n_rows])}
+        self._map(n_rows)
+
+    def _map(self, n_rows: int) -> None:
+        assert self.dim is not None
+        if n_rows == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim)
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.rows
+
+    def get(self, key: str) -> npt.NDArray[np.float32] | None:
+        row = self.rows.get(key)
+        if row is None or self._vectors is None:
+            return None
+        return self._vectors[row]
+
+    def lookup(
+        self, keys: list[str]
+    ) -> tuple[dict[int, npt.NDArray[np.float32]], list[int]]:
+        """
+        Returns `({position: vector}, [positions that missed])` for a list of keys.
+        """
+        hits: dict[int, npt.NDArray[np.float32]] = {}
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            vector = self.get(key)
+            if vector is None:
+                missing.append(i)
+            else:
+                hits[i] = vector
+        return hits, missing
+
+    def add(self, keys: Iterable[str], vectors: npt.NDArray[np.float32]) -> None:
+        """
+        Append new embeddings. Keys that are already cached are skipped.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) == 0:
+            return
+
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim}, f)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Expected {self.dim} dimensional embeddings, got {vectors.shape[1]}"
+            )
+
+        new_keys: dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if key not in self.rows and key not in new_keys:
+                new_keys[key] = i
+        if not new_keys:
+            return
+
+        # vectors first: a key without a vector is dropped on load, the reverse isn't safe
+        with open(self._vectors_path, "ab") as f:
+            f.write(vectors[list(new_keys.values())].tobytes())
+        with open(self._keys_path, "a", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in new_keys))
+
+        start = len(self.rows)
+        for i, key in enumerate(new_keys):
+            self.rows[key] = start + i
+        self._map(len(self.rows))
@@ -0,0 +1,185 @@
+"""
+Posting lists over a few metadata fields, for filtered searches.
+
+For each indexed value (a tag, a section, `draft: true`) the index keeps the sorted row
+numbers that have it, in a compact array that rows are appended to as they're added, and
+dates are kept as a column of day numbers. A `where` filter is turned into a boolean
+mask over the store's rows, which the scorer applies before picking the top k, so a
+filter never loses results the way filtering the top k afterwards does.
+
+Filters use (a subset of) Chroma's `where` syntax:
+
+>>> index.mask({"tags": "alchemy"}, count)
+>>> index.mask({"$and": [{"draft": {"$ne": True}}, {"date": {"$gte": "2023-01-01"}}]}, count)
+
+- `{field: value}` or `{field: {"$eq": value}}`: for a list field (tags), has the value
+- `"$ne"`, `"$in"`, `"$nin"`; rows without the field match `$ne` and `$nin`
+- `"$gt"`, `"$gte"`, `"$lt"`, `"$lte"` on date fields, with ISO dates or `datetime.date`s
+- `"$and"` and `"$or"` over lists of filters
+
+Like the lexical index, the postings are numbered by store row and include deleted rows;
+the store's `live` mask takes care of those. The index is rebuilt from the table's
+metadata when the store is loaded, which is cheap next to parsing the table.
+"""
+
+from __future__ import annotations
+
+import datetime
+from array import array
+from typing import Any, Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+__all__ = ["MetadataIndex", "FIELDS"]
+
+# field -> kind: "keyword" (one value), "list" (any number of values, stored as a list; a
+# string is a single value, since a tag can have a comma in it) or "date"
+FIELDS = {
+    "tags": "list",
+    "categories": "list",
+    "section": "keyword",
+    "draft": "keyword",
+    "date": "date",
+}
+
+_NO_DATE = -1
+_RANGES = {"$gt", "$gte", "$lt", "$lte"}
+
+
+def _day(value: Any) -> int:
+    """
+    A date as a day number, or `_NO_DATE`. Accepts dates, datetimes and ISO strings
+    (only the date part of a timestamp is used).
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date().toordinal()
+    if isinstance(value, datetime.date):
+        return value.toordinal()
+    if isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value[:10]).toordinal()
+        except ValueError:
+            return _NO_DATE
+    return _NO_DATE
+
+
+def _values(value: Any, kind: str) -> list[Any]:
+    if value is None:
+        return []
+    if kind == "list" and isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class MetadataIndex(object):
+    """
+    `fields` maps the metadata fields to index to their kind (see `FIELDS`).
+    """
+
+    def __init__(self, fields: dict[str, str] | None = None) -> None:
+        self.fields = dict(FIELDS if fields is None else fields)
+        self.postings: dict[str, dict[Any, array[int]]] = {
+            field: {} for field, kind in self.fields.items() if kind != "date"
+        }
+        self.dates: dict[str, array[int]] = {
+            field: array("i") for field, kind in self.fields.items() if kind == "date"
+        }
+        self.count = 0
+
+    def add(
+        self, rows: Iterable[int], metadatas: Iterable[dict[str, Any] | None]
+    ) -> None:
+        """
+        Index rows' metadata. Rows have to be added in increasing order.
+        """
+        for row, metadata in zip(rows, metadatas):
+            if row < self.count:
+                raise ValueError(f"Row {row} has already been indexed")
+            metadata = metadata or {}
+            for field, postings in self.postings.items():
+                for value in _values(metadata.get(field), self.fields[field]):
+                    try:
+                        postings.setdefault(value, array("i")).append(row)
+                    except TypeError:
+                        pass  # unhashable, can't be filtered on
+            for field, column in self.dates.items():
+                # deleted rows that were never indexed, before `row`
+                column.extend([_NO_DATE] * (row - len(column)))
+                column.append(_day(metadata.get(field)))
+            self.count = row + 1
+
+    def _rows(self, field: str, value: Any) -> npt.NDArray[np.int32]:
+        posting = self.postings[field].get(value)
+        if posting is None:
+            return np.zeros(0, dtype=np.int32)
+        return np.frombuffer(posting, dtype=np.int32)
+
+    def _date_mask(
+        self, field: str, op: str, value: Any, count: int
+    ) -> npt.NDArray[np.bool_]:
+        column = np.full(count, _NO_DATE, dtype=np.int32)
+        indexed = np.frombuffer(self.dates[field], dtype=np.int32)[:count]
+        column[: len(indexed)] = indexed
+        if op in ("$eq", "$ne", "$in", "$nin"):
+            days = [_day(v) for v in (value if op in ("$in", "$nin") else [value])]
+            mask = np.isin(column, days)
+            return ~mask if op in ("$ne", "$nin") else mask
+        day = _day(value)
+        if day == _NO_DATE:
+            raise ValueError(f"Expected a date for {field} {op}, got {value!r}")
+        has_date = column != _NO_DATE
+        if op == "$gt":
+            return has_date & (column > day)
+        if op == "$gte":
+            return has_date & (column >= day)
+        if op == "$lt":
+            return has_date & (column < day)
+        return has_date & (column <= day)
+
+    def _field_mask(
+        self, field: str, condition: Any, count: int
+    ) -> npt.NDArray[np.bool_]:
+        if field not in self.fields:
+            raise ValueError(
+                f"{field!r} isn't indexed, filters can use {sorted(self.fields)}"
+            )
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = np.ones(count, dtype=bool)
+        for op, value in condition.items():
+            if field in self.dates:
+                if op not in _RANGES and op not in ("$eq", "$ne", "$in", "$nin"):
+                    raise ValueError(f"Unknown operator {op!r}")
+                mask &= self._date_mask(field, op, value, count)
+                continue
+            if op in _RANGES:
+                raise ValueError(f"{op} only works on date fields, not {field!r}")
+            if op not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"Unknown operator {op!r}")
+            values = value if op in ("$in", "$nin") else [value]
+            matched = np.zeros(count, dtype=bool)
+            for v in values:
+                rows = self._rows(field, v)
+                matched[rows[rows < count]] = True
+            mask &= ~matched if op in ("$ne", "$nin") else matched
+        return mask
+
+    def mask(self, where: dict[str, Any], count: int) -> npt.NDArray[np.bool_]:
+        """
+        The rows (out of the first `count`) that match a `where` filter.
+        """
+        mask = np.ones(count, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for part in condition:
+                    mask &= self.mask(part, count)
+            elif key == "$or":
+                either = np.zeros(count, dtype=bool)
+                for part in condition:
+                    either |= self.mask(part, count)
+                mask &= either
+            else:
+                mask &= self._field_mask(key, condition, count)
+        return mask
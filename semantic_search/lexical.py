@@ -0,0 +1,213 @@
+"""
+A BM25 inverted index over the documents in the vector store.
+
+Dense embeddings are bad at proper nouns and code identifiers ("Roger Bacon",
+`extract_sections`); a lexical index is good at exactly those. Documents are numbered
+by their vector store row, so the store's `live` mask also applies here and the index is
+renumbered the same way on `compact`.
+
+Each term's postings are two compact arrays (row numbers and term frequencies) that can be
+appended to as rows are added, and viewed as NumPy arrays without copying for scoring.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import numpy.typing as npt
+
+__all__ = ["LexicalIndex", "tokenize"]
+
+# keeps identifiers like `extract_sections` together
+_token = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _token.findall(text.lower())
+
+
+class LexicalIndex(object):
+    """
+    >>> index = LexicalIndex()
+    >>> index.add(range(len(documents)), documents)
+    >>> rows, scores = index.search("roger bacon", store.live, k=10)
+
+    A filtered search passes the rows that match as `mask`: the corpus statistics (idf,
+    average length) are always those of the live rows, so a filter only decides which
+    rows can be returned, not how they're scored.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, tuple[array[int], array[int]]] = {}
+        self.doc_len = array("i")
+        self.count = 0  # the number of store rows that have been indexed
+        # idf and the average document length depend on which rows are live, so they're
+        # computed on demand and thrown away whenever the store changes
+        self._idf: dict[str, float] = {}
+        self._avgdl: float | None = None
+
+    def invalidate(self) -> None:
+        self._idf = {}
+        self._avgdl = None
+
+    def add(self, rows: Iterable[int], documents: Iterable[str | None]) -> None:
+        """
+        Index documents by row number. Rows have to be added in increasing order, which
+        is how the vector store hands them out.
+        """
+        for row, document in zip(rows, documents):
+            if row < self.count:
+                raise ValueError(f"Row {row} has already been indexed")
+            # rows without a document (skipped or never stored) get a zero length
+            while len(self.doc_len) < row:
+                self.doc_len.append(0)
+            tokens = tokenize(document or "")
+            self.doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array("i"), array("i"))
+                postings[0].append(row)
+                postings[1].append(tf)
+            self.count = row + 1
+        self.invalidate()
+
+    def _stats(self, live: npt.NDArray[np.bool_]) -> tuple[int, float]:
+        n_docs = int(live.sum())
+        if self._avgdl is None:
+            lengths = np.frombuffer(self.doc_len, dtype=np.int32)[: len(live)]
+            self._avgdl = float(lengths[live[: len(lengths)]].mean()) if n_docs else 0.0
+        # every live document is empty
+        if self._avgdl == 0.0:
+            n_docs = 0
+        return n_docs, self._avgdl
+
+    def idf(self, term: str, live: npt.NDArray[np.bool_]) -> float:
+        idf = self._idf.get(term)
+        if idf is None:
+            postings = self.postings.get(term)
+            df = 0
+            if postings is not None:
+                df = int(live[np.frombuffer(postings[0], dtype=np.int32)].sum())
+            n_docs, _ = self._stats(live)
+            idf = float(np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5)))
+            self._idf[term] = idf
+        return idf
+
+    def scores(
+        self,
+        query: str,
+        live: npt.NDArray[np.bool_],
+        mask: npt.NDArray[np.bool_] | None = None,
+    ) -> npt.NDArray[np.float32]:
+        """
+        BM25 score of every row for a query (zero for rows without any query terms, and
+        for rows outside `mask`).
+        """
+        scores = np.zeros(len(live), dtype=np.float32)
+        n_docs, avgdl = self._stats(live)
+        if n_docs == 0:
+            return scores
+        doc_len = np.frombuffer(self.doc_len, dtype=np.int32)
+        for term, qtf in Counter(tokenize(query)).items():
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            rows = np.frombuffer(postings[0], dtype=np.int32)
+            tf = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * doc_len[rows] / avgdl)
+            weight = qtf * self.idf(term, live)
+            # a row appears at most once per term, so plain fancy-index addition is safe
+            scores[rows] += weight * tf * (self.k1 + 1.0) / (tf + norm)
+        scores[~(live if mask is None else live & mask)] = 0.0
+        return scores
+
+    def search(
+        self,
+        query: str,
+        live: npt.NDArray[np.bool_],
+        k: int = 10,
+        mask: npt.NDArray[np.bool_] | None = None,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+        """
+        The top `k` live rows (in `mask`, if it's given) with a non-zero score, best
+        first.
+        """
+        scores = self.scores(query, live, mask)
+        matched = np.flatnonzero(scores)
+        k = min(k, len(matched))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return top, scores[top]
+
+    def remap(self, keep: npt.NDArray[np.int64]) -> None:
+        """
+        Renumber the rows after the store has been compacted down to the rows in `keep`.
+        """
+        new_rows = np.full(self.count, -1, dtype=np.int32)
+        keep = keep[keep < self.count]
+        new_rows[keep] = np.arange(len(keep), dtype=np.int32)
+        for term, (rows, tfs) in list(self.postings.items()):
+            mapped = new_rows[np.frombuffer(rows, dtype=np.int32)]
+            kept = mapped >= 0
+            if not kept.any():
+                del self.postings[term]
+                continue
+            tf = np.frombuffer(tfs, dtype=np.int32)[kept]
+            self.postings[term] = (array("i", mapped[kept].tobytes()), array("i", tf.tobytes()))
+        lengths = np.frombuffer(self.doc_len, dtype=np.int32)
+        self.doc_len = array("i", lengths[keep].tobytes())
+        self.count = len(keep)
+        self.invalidate()
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        terms = sorted(self.postings)
+        lengths = np.array([len(self.postings[t][0]) for t in terms], dtype=np.int64)
+        path = Path(path)
+        tmp = path.with_suffix(".tmp.npz")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                terms=np.array(terms, dtype=str),
+                offsets=np.concatenate([[0], np.cumsum(lengths)]),
+                rows=np.frombuffer(
+                    b"".join(self.postings[t][0].tobytes() for t in terms),
+                    dtype=np.int32,
+                ),
+                tfs=np.frombuffer(
+                    b"".join(self.postings[t][1].tobytes() for t in terms),
+                    dtype=np.int32,
+                ),
+                doc_len=np.frombuffer(self.doc_len, dtype=np.int32),
+                count=np.array(self.count),
+                params=np.array([self.k1, self.b]),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> LexicalIndex:
+        with np.load(path) as data:
+            k1, b = data["params"]
+            index = cls(float(k1), float(b))
+            offsets = data["offsets"]
+            rows = data["rows"]
+            tfs = data["tfs"]
+            for i, term in enumerate(data["terms"].tolist()):
+                start, stop = offsets[i], offsets[i + 1]
+                index.postings[term] = (
+                    array("i", rows[start:stop].tobytes()),
+                    array("i", tfs[start:stop].tobytes()),
+                )
+            index.doc_len = array("i", data["doc_len"].tobytes())
+            index.count = int(data["count"])
+        return index
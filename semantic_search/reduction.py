@@ -0,0 +1,120 @@
+"""
+Fewer dimensions per stored vector.
+
+Scoring cost and index size are proportional to the number of dimensions, and most of the
+similarity structure of a sentence embedding is in far fewer than 768 of them. A
+`Projection` maps embeddings down to `dim` dimensions and renormalizes them, either:
+- "pca": onto the top principal components of the corpus (fitted on a sample of it)
+- "truncate": keeping the first `dim` coordinates, for Matryoshka-trained models whose
+  leading dimensions are meant to be used on their own
+
+A store with a projection applies it to everything it's given, vectors and queries alike.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+__all__ = ["Projection"]
+
+METHODS = ("pca", "truncate")
+
+
+class Projection(object):
+    """
+    >>> projection = Projection.pca(store.vectors(), dim=256)
+    >>> reduced = projection.apply(embeddings)
+    """
+
+    def __init__(
+        self,
+        method: str,
+        input_dim: int,
+        dim: int,
+        components: npt.NDArray[np.float32] | None = None,
+        mean: npt.NDArray[np.float32] | None = None,
+    ) -> None:
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+        if not 0 < dim < input_dim:
+            raise ValueError(f"Can't reduce {input_dim} dimensions to {dim}")
+        self.method = method
+        self.input_dim = input_dim
+        self.dim = dim
+        self.components = components  # (dim, input_dim), for "pca"
+        self.mean = mean
+
+    @classmethod
+    def pca(
+        cls,
+        vectors: npt.ArrayLike,
+        dim: int,
+        sample_size: int = 50000,
+        seed: int = 0,
+    ) -> Projection:
+        """
+        Fit on (a sample of) the normalized vectors of a corpus.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < dim:
+            raise ValueError(f"Need at least {dim} vectors to fit {dim} components")
+        if len(vectors) > sample_size:
+            rng = np.random.default_rng(seed)
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, False))]
+        mean = vectors.mean(axis=0)
+        # the right singular vectors of the centred data are the principal components
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        components = np.ascontiguousarray(vt[:dim], dtype=np.float32)
+        return cls("pca", vectors.shape[1], dim, components, mean.astype(np.float32))
+
+    @classmethod
+    def truncate(cls, input_dim: int, dim: int) -> Projection:
+        return cls("truncate", input_dim, dim)
+
+    def apply(self, vectors: npt.ArrayLike) -> npt.NDArray[np.float32]:
+        """
+        Project rows of `input_dim` dimensions to normalized rows of `dim`.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.input_dim:
+            raise ValueError(
+                f"Expected {self.input_dim} dimensional embeddings, got {vectors.shape[1]}"
+            )
+        if self.method == "truncate":
+            reduced = vectors[:, : self.dim]
+        else:
+            assert self.components is not None and self.mean is not None
+            reduced = (vectors - self.mean) @ self.components.T
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(reduced / norms, dtype=np.float32)
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        path = Path(path)
+        arrays = {
+            "method": np.array(self.method),
+            "input_dim": np.array(self.input_dim),
+            "dim": np.array(self.dim),
+        }
+        if self.components is not None and self.mean is not None:
+            arrays["components"] = self.components
+            arrays["mean"] = self.mean
+        tmp = path.with_suffix(".tmp.npz")
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> Projection:
+        with np.load(path) as data:
+            return cls(
+                str(data["method"]),
+                int(data["input_dim"]),
+                int(data["dim"]),
+                data["components"] if "components" in data else None,
+                data["mean"] if "mean" in data else None,
+            )
@@ -1,6 +1,315 @@
-from sentence_transformers import SentenceTransformer
+"""
+Semantic, lexical and hybrid search over a local vector store.
+
+The model (sentence-transformers and torch, seconds to import) and the embedding cache
+are only loaded when something needs them, so a process that only searches a persisted
+index starts quickly, and a lexical search never loads the model at all.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from metrics import count, timer
+from .embedding_cache import EmbeddingCache, text_key
+from .reduction import Projection
+from .vector_store import VectorStore
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+    from .aio import AsyncSearch
+
+__all__ = ["SemanticSearch"]
 
 
 class SemanticSearch:
-    def __init__(self, model_name: str = "all-mpnet-base-v2", persist_dir: str = "./"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = "all-mpnet-base-v2",
+        persist_dir: str = "./",
+        batch_size: int = 32,
+        dtype: str | None = None,
+        rerank: int = 0,
+        shards: int = 0,
+    ):
+        self.model_name = model_name
+        self.persist_dir = persist_dir
+        self.batch_size = batch_size
+        self._model: SentenceTransformer | None = None
+        self._cache: EmbeddingCache | None = None
+        # dtype "float16" or "int8" keeps a quantized copy of the vectors for scoring,
+        # see VectorStore
+        scorer = None
+        if shards:
+            # exact scans split across `shards` worker processes, see shards.py
+            from .shards import ShardedScorer
+
+            scorer = ShardedScorer(shards)
+        self.store = VectorStore(
+            os.path.join(persist_dir, "vectors"),
+            dtype=dtype,
+            rerank=rerank,
+            scorer=scorer,
+        )
+        # runs the lexical half of a hybrid search while the query is being embedded
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        self._async: AsyncSearch | None = None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            with timer("model.load"):
+                from sentence_transformers import SentenceTransformer
+
+                self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        if self._cache is None:
+            self._cache = EmbeddingCache(
+                os.path.join(self.persist_dir, "embedding_cache"), self.model_name
+            )
+        return self._cache
+
+    def embed_sections(
+        self, sections: Sequence[dict[str, Any] | str]
+    ) -> npt.NDArray[np.float32]:
+        """
+        Embed sections (as returned by `extract_sections`) or plain strings. Returns a
+        contiguous float32 array with one normalized row per section, in input order.
+
+        Cached embeddings are reused; only the misses go through the model.
+        """
+        # imported here, so searching doesn't load the markdown parser
+        from postchunker import section_text
+
+        texts = [s if isinstance(s, str) else section_text(s) for s in sections]
+        keys = [text_key(text) for text in texts]
+        hits, missing = self.cache.lookup(keys)
+        count("embedding_cache.hit", len(hits))
+        count("embedding_cache.miss", len(missing))
+
+        # when everything is cached the model isn't needed, so it isn't loaded
+        dim = self.cache.dim
+        if missing or dim is None:
+            dim = self.model.get_sentence_embedding_dimension()
+            assert dim is not None
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        for i, vector in hits.items():
+            embeddings[i] = vector
+
+        if missing:
+            # similar lengths in each batch means less padding in each forward pass
+            missing.sort(key=lambda i: len(texts[i]))
+            with timer("model.encode_sections"):
+                encoded = self.model.encode(
+                    [texts[i] for i in missing],
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                )
+            embeddings[missing] = encoded
+            self.cache.add([keys[i] for i in missing], encoded)
+
+        return embeddings
+
+    def embed_query(self, query: str) -> npt.NDArray[np.float32]:
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: list[str]) -> npt.NDArray[np.float32]:
+        """
+        Embed several queries in one forward pass.
+        """
+        with timer("model.encode_queries"):
+            return self.model.encode(
+                queries,
+                batch_size=max(len(queries), 1),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 10,
+        mode: str = "hybrid",
+        candidates: int = 50,
+        rrf_k: int = 60,
+        embedding: npt.NDArray[np.float32] | None = None,
+        where: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Search the local vector store. Returns a list of hits, best first:
+
+        >>> search.search("roger bacon", n_results=1)
+        [{'id': 'notes/roger-bacon-as-magician.md#0', 'score': 0.032, 'document': '...', 'metadata': {...}}]
+
+        `mode` is "vector", "lexical" or "hybrid". In hybrid mode the top `candidates`
+        from the BM25 index and from the vectors are combined with reciprocal rank fusion
+        (each list contributes `1 / (rrf_k + rank)`); the lexical search runs on a
+        thread while the query is being embedded.
+
+        Pass `embedding` if the query has already been embedded (by a batch, or from a
+        cache) to skip the model.
+
+        `where` restricts the search to sections whose post's frontmatter matches, e.g.
+        `{"tags": "alchemy", "draft": {"$ne": True}}`; see `filters.py`.
+        """
+        if embedding is not None:
+            embedding = embedding[np.newaxis]
+        return self.search_many(
+            [query],
+            n_results,
+            mode,
+            candidates,
+            rrf_k,
+            embeddings=embedding,
+            where=where,
+        )[0]
+
+    def reduce_dimensions(self, dim: int, method: str = "pca") -> Projection:
+        """
+        Store `dim` dimensional vectors rather than the model's: a PCA fitted on the
+        indexed sections, or `method="truncate"` for Matryoshka models. The store is
+        rewritten, and later additions and queries are projected the same way.
+
+        Use `benchmarks.dimension_recall` to see what a dimension costs in recall first.
+        """
+        store = self.store
+        input_dim = self.model.get_sentence_embedding_dimension()
+        assert input_dim is not None
+        if method == "pca":
+            if store.dim != input_dim or len(store) == 0:
+                raise ValueError("PCA is fitted on the indexed sections, index some first")
+            projection = Projection.pca(store.vectors()[store.live], dim)
+        else:
+            projection = Projection(method, input_dim, dim)
+        store.reduce(projection)
+        return projection
+
+    async def asearch(
+        self, query: str, n_results: int = 10, mode: str = "hybrid"
+    ) -> list[dict[str, Any]]:
+        """
+        `search` for asyncio code. Concurrent calls are batched, and identical queries
+        in flight at the same time are only run once; `async_stats()` reports latency
+        percentiles and batch sizes.
+
+        >>> hits = await search.asearch("roger bacon", n_results=5)
+        """
+        if self._async is None:
+            from .aio import AsyncSearch
+
+            self._async = AsyncSearch(self)
+        return await self._async.search(query, n_results, mode)
+
+    def async_stats(self) -> dict[str, Any]:
+        return self._async.stats() if self._async is not None else {}
+
+    def search_many(
+        self,
+        queries: list[str],
+        n_results: int = 10,
+        mode: str = "hybrid",
+        candidates: int = 50,
+        rrf_k: int = 60,
+        embeddings: npt.NDArray[np.float32] | None = None,
+        where: dict[str, Any] | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Run several searches at once: the queries are embedded in one forward pass and
+        scored against the store in one matrix product. Returns a list of hits for each
+        query, in order. See `search` for the arguments.
+        """
+        if mode not in ("vector", "lexical", "hybrid"):
+            raise ValueError(f"Unknown search mode {mode!r}")
+        if not queries:
+            return []
+        count("search." + mode, len(queries))
+        with timer("search." + mode):
+            return self._search_many(
+                queries, n_results, mode, candidates, rrf_k, embeddings, where
+            )
+
+    def _search_many(
+        self,
+        queries: list[str],
+        n_results: int,
+        mode: str,
+        candidates: int,
+        rrf_k: int,
+        embeddings: npt.NDArray[np.float32] | None,
+        where: dict[str, Any] | None,
+    ) -> list[list[dict[str, Any]]]:
+        store = self.store
+        # a filter only narrows what the lexical search returns; its idf and average
+        # length are always those of the whole (live) store
+        live = store.live
+        mask = store.matching(where) if where is not None else None
+        if mode == "lexical":
+            results = []
+            for query in queries:
+                rows, scores = store.lexical.search(
+                    query, live, k=n_results, mask=mask
+                )
+                results.append(
+                    [
+                        self._hit(store, int(row), float(score))
+                        for row, score in zip(rows, scores)
+                    ]
+                )
+            return results
+
+        if mode == "vector":
+            if embeddings is None:
+                embeddings = self.embed_queries(queries)
+            with timer("store.query"):
+                dense = store.query(embeddings, n_results=n_results, where=where)
+            return [
+                [
+                    self._hit(store, store.rows[id], 1.0 - distance)
+                    for id, distance in zip(ids, distances)
+                ]
+                for ids, distances in zip(dense["ids"], dense["distances"])
+            ]
+
+        lexical = [
+            self._executor.submit(
+                store.lexical.search, query, live, candidates, mask
+            )
+            for query in queries
+        ]
+        if embeddings is None:
+            embeddings = self.embed_queries(queries)
+        with timer("store.query"):
+            dense = store.query(embeddings, n_results=candidates, where=where)
+
+        results = []
+        for ids, future in zip(dense["ids"], lexical):
+            lexical_rows, _ = future.result()
+            fused: dict[int, float] = {}
+            rankings = [[store.rows[id] for id in ids], lexical_rows.tolist()]
+            for ranking in rankings:
+                for rank, row in enumerate(ranking):
+                    fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+            best = sorted(fused.items(), key=lambda item: -item[1])[:n_results]
+            results.append([self._hit(store, row, score) for row, score in best])
+        return results
+
+    def _hit(self, store: VectorStore, row: int, score: float) -> dict[str, Any]:
+        # takes the store rather than using self.store, which can be swapped for a
+        # refreshed one while a search is running
+        return {
+            "id": store.ids[row],
+            "score": score,
+            "document": store.documents[row],
+            "metadata": store.metadatas[row],
+        }
@@ -0,0 +1,329 @@
+"""
+A long-running query service around SemanticSearch.
+
+Loading the model takes seconds and a forward pass tens of milliseconds, so a process per
+query is wasteful. The service keeps the model loaded and:
+- collects queries that arrive within a few milliseconds of each other and embeds them
+  in a single forward pass
+- keeps an LRU cache of query embeddings, and of results; results are dropped whenever
+  the index changes
+- notices when the indexer has written to the store, and swaps in a fresh copy
+
+    python -m semantic_search.service --persist-dir ./ --port 8765
+    curl 'localhost:8765/search?q=roger+bacon&k=5'
+
+With `--metrics`, stage timings are collected and served from /metrics in the Prometheus
+text format.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Generic, TypeVar
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import numpy.typing as npt
+
+import metrics
+from .semantic_search import SemanticSearch
+from .vector_store import VectorStore
+
+__all__ = ["QueryBatcher", "QueryService", "LRUCache", "serve"]
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _whitespace.sub(" ", query).strip()
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A thread-safe LRU cache.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self.items: OrderedDict[K, V] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> V | None:
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class QueryBatcher(object):
+    """
+    Embeds queries submitted from any thread in batches. The first query in a batch waits
+    at most `max_wait` seconds for others to join it.
+
+    >>> batcher = QueryBatcher(search.embed_queries)
+    >>> embedding = batcher.submit("roger bacon").result()
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], npt.NDArray[np.float32]],
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+    ) -> None:
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: queue.Queue[tuple[str, Future[npt.NDArray[np.float32]]] | None] = (
+            queue.Queue()
+        )
+        self.batches = 0
+        self.queries = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, text: str) -> Future[npt.NDArray[np.float32]]:
+        future: Future[npt.NDArray[np.float32]] = Future()
+        self.queue.put((text, future))
+        return future
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)  # finish this batch, then stop
+                    break
+                batch.append(item)
+
+            # the same query twice in a batch is only embedded once
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.encode(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            by_text = dict(zip(texts, embeddings))
+            for text, future in batch:
+                future.set_result(by_text[text])
+            self.batches += 1
+            self.queries += len(batch)
+
+
+class QueryService(object):
+    """
+    Thread-safe search with batching and caching, for use from a server's request
+    threads.
+    """
+
+    def __init__(
+        self,
+        search: SemanticSearch,
+        cache_size: int = 1024,
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+        refresh_interval: float = 1.0,
+    ) -> None:
+        self.engine = search
+        self.embeddings: LRUCache[str, npt.NDArray[np.float32]] = LRUCache(cache_size)
+        self.results: LRUCache[tuple[str, int, str], list[dict[str, Any]]] = LRUCache(
+            cache_size
+        )
+        self.batcher = QueryBatcher(search.embed_queries, max_batch, max_wait)
+        self.refresh_interval = refresh_interval
+        self.version = search.store.version
+        self._checked = time.monotonic()
+        self._refresh_lock = threading.Lock()
+
+    def _maybe_refresh(self) -> None:
+        """
+        At most once every `refresh_interval` seconds, check if the store has changed on
+        disk. If it has, load a new copy and swap it in; searches already running keep
+        the old one.
+        """
+        now = time.monotonic()
+        if now - self._checked < self.refresh_interval:
+            return
+        with self._refresh_lock:
+            if now - self._checked < self.refresh_interval:
+                return
+            self._checked = now
+            if self.engine.store.is_stale():
+                old = self.engine.store
+                self.engine.store = VectorStore(
+                    old.dir, nprobe=old.nprobe, rerank=old.rerank, scorer=old.scorer
+                )
+        if self.engine.store.version != self.version:
+            self.version = self.engine.store.version
+            self.results.clear()
+
+    def embed(self, query: str) -> npt.NDArray[np.float32]:
+        key = normalize_query(query)
+        embedding = self.embeddings.get(key)
+        if embedding is None:
+            embedding = self.batcher.submit(key).result()
+            self.embeddings.put(key, embedding)
+        return embedding
+
+    def search(
+        self, query: str, n_results: int = 10, mode: str = "hybrid"
+    ) -> list[dict[str, Any]]:
+        self._maybe_refresh()
+        key = (normalize_query(query), n_results, mode)
+        hits = self.results.get(key)
+        if hits is not None:
+            return hits
+
+        version = self.engine.store.version
+        embedding = None if mode == "lexical" else self.embed(query)
+        hits = self.engine.search(
+            query, n_results=n_results, mode=mode, embedding=embedding
+        )
+        # don't cache results computed against a store that's since been replaced
+        if version == self.version:
+            self.results.put(key, hits)
+        return hits
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": list(self.version),
+            "rows": len(self.engine.store),
+            "batches": self.batcher.batches,
+            "queries": self.batcher.queries,
+            "embedding_cache": {
+                "size": len(self.embeddings),
+                "hits": self.embeddings.hits,
+                "misses": self.embeddings.misses,
+            },
+            "result_cache": {
+                "size": len(self.results),
+                "hits": self.results.hits,
+                "misses": self.results.misses,
+            },
+        }
+
+    def close(self) -> None:
+        self.batcher.close()
+        if self.engine.store.scorer is not None:
+            self.engine.store.scorer.close()
+
+
+def make_handler(service: QueryService) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            try:
+                if url.path == "/search":
+                    query = params["q"][0]
+                    n_results = int(params.get("k", ["10"])[0])
+                    mode = params.get("mode", ["hybrid"])[0]
+                    body: Any = service.search(query, n_results, mode)
+                elif url.path == "/stats":
+                    body = service.stats()
+                elif url.path == "/metrics":
+                    self._send(
+                        metrics.registry.to_prometheus().encode("utf-8"),
+                        "text/plain; version=0.0.4",
+                    )
+                    return
+                else:
+                    self.send_error(404)
+                    return
+            except (KeyError, ValueError) as e:
+                self.send_error(400, str(e))
+                return
+            self._send(json.dumps(body, default=str).encode("utf-8"), "application/json")
+
+        def _send(self, data: bytes, content_type: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass  # one line per query is too noisy
+
+    return Handler
+
+
+def serve(
+    search: SemanticSearch, host: str = "127.0.0.1", port: int = 8765, **options: Any
+) -> None:
+    service = QueryService(search, **options)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--persist-dir", default="./")
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--metrics", action="store_true", help="collect timings")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="score exact searches in this many worker processes (0 for none)",
+    )
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+    search = SemanticSearch(args.model, args.persist_dir, shards=args.shards)
+    serve(search, args.host, args.port)
@@ -0,0 +1,268 @@
+"""
+Exact search split across processes, for stores too big for one core to scan quickly.
+
+The rows are split into `n_shards` contiguous ranges and each range is scored by a
+worker process. Nothing is copied per query: the workers map the store's vector (or
+quantized) files themselves, so every process reads the same pages of the page cache,
+and the store's live-row mask is shared through `multiprocessing.shared_memory`
+(as is a filter's mask, in a second segment that's reused from query to query). Each
+worker sends back only its top k per query, and the shards' lists are merged with a
+heap.
+
+>>> store = VectorStore("./vectors", scorer=ShardedScorer(n_shards=8))
+>>> store.query(embeddings, n_results=10, exact=True)  # scored by the 8 workers
+
+Only the exact scan is sharded; an IVF search only scores a few clusters and stays in
+the calling process, as do scans of stores with fewer than `min_rows` rows, where
+sending the work to the workers costs more than doing it.
+
+The workers are started with the "spawn" method (forking a process that has loaded
+torch isn't safe), so scripts using this need the usual `if __name__ == "__main__":`
+guard. Each worker is limited to one BLAS thread, so that `n_shards` workers use
+`n_shards` cores.
+"""
+
+from __future__ import annotations
+
+import atexit
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import numpy as np
+import numpy.typing as npt
+
+from .vector_store import SCORE_BLOCK, top_k
+
+if TYPE_CHECKING:
+    from multiprocessing.pool import Pool
+
+    from .vector_store import VectorStore
+
+__all__ = ["ShardedScorer"]
+
+# set for the workers as they start, before they import numpy
+_BLAS_THREADS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+class Spec(NamedTuple):
+    """
+    Where a worker finds what it scores: the files are opened (and kept open) by path.
+    """
+
+    data: str  # the vectors, or the quantized codes
+    scales: str | None  # int8 scales
+    count: int  # rows written, dead ones included
+    live: str  # shared memory name of the live-row mask
+
+
+# per worker process: path -> mapped array, name -> attached shared memory
+_mapped: dict[str, np.memmap] = {}
+_shared: dict[str, shared_memory.SharedMemory] = {}
+
+
+def _open(path: str, count: int) -> np.memmap:
+    mapped = _mapped.get(path)
+    # a file that has grown is replaced by a bigger one, so this one could be short
+    if mapped is None or len(mapped) < count:
+        mapped = _mapped[path] = np.load(path, mmap_mode="r")
+    return mapped
+
+
+def _live(name: str, count: int) -> npt.NDArray[np.bool_]:
+    shm = _shared.get(name)
+    if shm is None:
+        # the store's mask and a filter's are in use at a time; anything older has
+        # been replaced
+        while len(_shared) >= 2:
+            _shared.pop(next(iter(_shared))).close()
+        shm = _shared[name] = shared_memory.SharedMemory(name)
+    return np.ndarray((count,), dtype=bool, buffer=shm.buf)
+
+
+def _score_shard(
+    spec: Spec, queries: npt.NDArray[np.float32], start: int, stop: int, k: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+    """
+    The best `k` live rows between `start` and `stop` for each query: `(rows, scores)`,
+    each `(len(queries), k)` and best first. Runs in a worker.
+    """
+    data = _open(spec.data, spec.count)
+    scales = _open(spec.scales, spec.count) if spec.scales is not None else None
+    live = _live(spec.live, spec.count)
+
+    scores = np.empty((len(queries), stop - start), dtype=np.float32)
+    for block_start in range(start, stop, SCORE_BLOCK):
+        block_stop = min(block_start + SCORE_BLOCK, stop)
+        block = queries @ data[block_start:block_stop].astype(np.float32, copy=False).T
+        if scales is not None:
+            block *= scales[block_start:block_stop]
+        scores[:, block_start - start : block_stop - start] = block
+    scores[:, ~live[start:stop]] = -np.inf
+
+    k = min(k, stop - start)
+    rows = np.empty((len(queries), k), dtype=np.int64)
+    best = np.empty((len(queries), k), dtype=np.float32)
+    for i, row_scores in enumerate(scores):
+        top, top_scores = top_k(row_scores, k)
+        rows[i] = top + start
+        best[i] = top_scores
+    return rows, best
+
+
+class ShardedScorer(object):
+    """
+    A pool of `n_shards` worker processes (one per core by default) scoring a store's
+    rows. It can be shared by several stores, and is started on first use.
+    """
+
+    def __init__(self, n_shards: int | None = None, min_rows: int = 50_000) -> None:
+        self.n_shards = max(n_shards or os.cpu_count() or 1, 1)
+        self.min_rows = min_rows
+        self._pool: Pool | None = None
+        self._live: shared_memory.SharedMemory | None = None
+        self._live_key: tuple[Any, ...] | None = None
+        self._filter: shared_memory.SharedMemory | None = None
+        # one search at a time uses the pool (each one already uses every worker), and
+        # the live mask isn't replaced while workers are reading it
+        self._lock = threading.Lock()
+
+    def _start(self) -> Pool:
+        saved = {name: os.environ.get(name) for name in _BLAS_THREADS}
+        os.environ.update(dict.fromkeys(_BLAS_THREADS, "1"))
+        try:
+            # all the workers are started here, while the variables are set
+            pool = multiprocessing.get_context("spawn").Pool(self.n_shards)
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    del os.environ[name]
+                else:
+                    os.environ[name] = value
+        # the shared memory isn't freed when the process exits
+        atexit.register(self.close)
+        return pool
+
+    @staticmethod
+    def _fit(
+        segment: shared_memory.SharedMemory | None, count: int
+    ) -> shared_memory.SharedMemory:
+        """
+        `segment` if it holds a mask of `count` rows, otherwise a new one replacing it.
+        """
+        size = max(count, 1)
+        if segment is not None and segment.size == size:
+            return segment
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    @staticmethod
+    def _fill(
+        segment: shared_memory.SharedMemory, mask: npt.NDArray[np.bool_]
+    ) -> None:
+        shared = np.ndarray((len(mask),), dtype=bool, buffer=segment.buf)
+        shared[:] = mask
+        del shared  # the buffer can't be closed while an array is using it
+
+    def _share_live(
+        self, store: VectorStore, live: npt.NDArray[np.bool_] | None = None
+    ) -> str:
+        """
+        The name of a shared copy of the store's live mask, copied again whenever the
+        store has changed, or of `live` (a filtered mask) if it's given. A filter's mask
+        has a segment of its own, so filtered searches don't throw away the copy of the
+        store's mask, and it's rewritten in place while the store's size stays the same.
+        Called with the lock held, so no worker is reading either segment.
+        """
+        if live is not None:
+            self._filter = self._fit(self._filter, store.count)
+            self._fill(self._filter, live)
+            return self._filter.name
+        key = (str(store.dir), store.version, store.count)
+        if self._live is None or key != self._live_key:
+            self._live = self._fit(self._live, store.count)
+            self._fill(self._live, store.live)
+            self._live_key = key
+        return self._live.name
+
+    def _spec(
+        self, store: VectorStore, live: npt.NDArray[np.bool_] | None = None
+    ) -> Spec:
+        if store.dtype == "float32":
+            data, scales = store._vectors_path, None
+        else:
+            data = store._codes_path
+            scales = store._scales_path if store.dtype == "int8" else None
+        return Spec(
+            str(data),
+            str(scales) if scales is not None else None,
+            store.count,
+            self._share_live(store, live),
+        )
+
+    def top_k(
+        self,
+        store: VectorStore,
+        queries: npt.NDArray[np.float32],
+        k: int,
+        live: npt.NDArray[np.bool_] | None = None,
+    ) -> list[tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]]:
+        """
+        The best `k` live rows for each (normalized, projected) query, as `(rows,
+        scores)`, best first. Scores are from the vectors the store scans: the quantized
+        ones, for a quantized store. `live` replaces the store's mask, for a filter.
+        """
+        bounds = np.linspace(0, store.count, self.n_shards + 1).astype(int)
+        shards = [(int(a), int(b)) for a, b in zip(bounds, bounds[1:]) if b > a]
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._start()
+            spec = self._spec(store, live)
+            results = self._pool.starmap(
+                _score_shard, [(spec, queries, a, b, k) for a, b in shards]
+            )
+
+        hits = []
+        for i in range(len(queries)):
+            # each shard's list is sorted best first, so a k-way merge of their heads
+            merged = heapq.merge(
+                *(zip(-scores[i], rows[i]) for rows, scores in results)
+            )
+            best = [
+                (row, -negative)
+                for negative, row in itertools.islice(merged, k)
+                if negative != np.inf
+            ]
+            hits.append(
+                (
+                    np.array([row for row, _ in best], dtype=np.int64),
+                    np.array([score for _, score in best], dtype=np.float32),
+                )
+            )
+        return hits
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._live is not None:
+            self._live.close()
+            self._live.unlink()
+            self._live = None
+            self._live_key = None
+        if self._filter is not None:
+            self._filter.close()
+            self._filter.unlink()
+            self._filter = None
@@ -0,0 +1,837 @@
+"""
+A local vector store that doesn't need a server.
+
+Normalized embeddings live in a memory-mapped `.npy` file and the ids, documents and
+metadata in an append-only `table.jsonl`. The table's first line says which generation of
+the vectors file it belongs to, so `compact` can write a new one and switch over by
+replacing the table. Queries are a matrix product over the mapped vectors plus
+`argpartition` for the top k, which is plenty fast for a few hundred thousand chunks.
+
+A store can also keep a quantized copy of the vectors, float16 or int8 with a scale per
+row, which is what queries scan: a half or a quarter of the memory. The float32 vectors
+stay on disk for rebuilding the indexes, and for an optional exact rerank of the best
+candidates, which only touches the pages of those rows.
+
+`reduce` gives a store fewer dimensions (see `reduction.Projection`). Embeddings and
+queries are then projected as they come in, so callers keep passing the model's output.
+
+The methods follow the Chroma collection API (`add`, `upsert`, `delete`, `get`, `query`),
+so the store can be used anywhere a collection is expected:
+
+>>> store = VectorStore("./vectors")
+>>> store.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+>>> store.query(query_embeddings=search.model.encode(["roger bacon"]), n_results=5)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from .ann import IVFIndex
+from .filters import MetadataIndex
+from .lexical import LexicalIndex
+from .reduction import Projection
+
+if TYPE_CHECKING:
+    from .shards import ShardedScorer
+
+__all__ = ["VectorStore"]
+
+INITIAL_CAPACITY = 1024
+DTYPES = ("float32", "float16", "int8")
+# rows dequantized at a time when scanning a quantized store
+SCORE_BLOCK = 4096
+# a filter matching fewer than this fraction of the rows is scored by gathering just
+# those rows; a broader one by scanning everything with the others masked out (the two
+# cost the same at around a quarter to a third, see benchmarks/filtered_query.py)
+FILTER_GATHER = 0.25
+
+
+def normalize(vectors: npt.ArrayLike) -> npt.NDArray[np.float32]:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(vectors / norms)
+
+
+def top_k(
+    scores: npt.NDArray[np.float32], k: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+    """
+    Positions and values of the `k` highest scores, best first.
+    """
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+def quantize(
+    vectors: npt.NDArray[np.float32], dtype: str
+) -> tuple[npt.NDArray[Any], npt.NDArray[np.float32] | None]:
+    """
+    Quantized copies of normalized vectors, and for int8 the per-row scales that
+    multiply back to (approximately) the originals.
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class VectorStore(object):
+    """
+    Rows are only ever appended. Deleting marks a row as dead (and it stops showing up in
+    results); `compact` rewrites both files without the dead rows.
+
+    Once `build_ann` has been called, queries go through an IVF index and only score the
+    rows in the `nprobe` closest clusters. New rows are filed in the index as they're
+    added.
+
+    Documents are also kept in a BM25 `lexical` index. Both indexes are caught up with any
+    rows added since they were last saved when the store is opened; `save_indexes` saves
+    them.
+
+    `dtype` ("float32", "float16" or "int8") picks the storage for a new store; an
+    existing one keeps the dtype it was created with. `rerank` is how many of the best
+    candidates from a quantized scan are rescored with the float32 vectors (0 for none).
+
+    With a `scorer` (a `shards.ShardedScorer`), exact scans of a large store are split
+    across its worker processes.
+
+    Queries can be filtered on the metadata fields in `filters.FIELDS` (tags, section,
+    draft, date) with a Chroma style `where`; the postings are kept in `filters`.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        nprobe: int = 8,
+        dtype: str | None = None,
+        rerank: int = 0,
+        scorer: ShardedScorer | None = None,
+    ) -> None:
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype {dtype!r}, expected one of {DTYPES}")
+        self.dir = Path(path)
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.scorer = scorer
+        self._requested_dtype = dtype
+        self._reset()
+        self.load()
+        if dtype is not None and self.dim is not None and dtype != self.dtype:
+            raise ValueError(f"{self.dir} stores {self.dtype} vectors, not {dtype}")
+
+    def _reset(self) -> None:
+        self.ann: IVFIndex | None = None
+        self.lexical = LexicalIndex()
+        self.filters = MetadataIndex()
+        self.projection: Projection | None = None
+        self.dim: int | None = None
+        self.count = 0  # rows written, including deleted ones
+        self.ids: list[str | None] = []  # None for deleted rows
+        self.documents: list[str | None] = []
+        self.metadatas: list[dict[str, Any] | None] = []
+        self.rows: dict[str, int] = {}
+        self.live = np.zeros(0, dtype=bool)
+        self.generation = 0
+        self.dtype = self._requested_dtype or "float32"
+        self._vectors: np.memmap | None = None
+        self._codes: np.memmap | None = None
+        self._scales: np.memmap | None = None
+        self._table_bytes = 0
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / f"vectors-{self.generation}.npy"
+
+    @property
+    def _codes_path(self) -> Path:
+        return self.dir / f"codes-{self.generation}.npy"
+
+    @property
+    def _scales_path(self) -> Path:
+        return self.dir / f"scales-{self.generation}.npy"
+
+    @property
+    def _projection_path(self) -> Path:
+        return self.dir / f"projection-{self.generation}.npz"
+
+    @property
+    def _table_path(self) -> Path:
+        return self.dir / "table.jsonl"
+
+    @property
+    def _ann_path(self) -> Path:
+        return self.dir / f"ivf-{self.generation}.npz"
+
+    @property
+    def _lexical_path(self) -> Path:
+        return self.dir / f"lexical-{self.generation}.npz"
+
+    def load(self) -> None:
+        if not self._table_path.exists():
+            # a new store can have been given a projection before its first rows
+            if self._projection_path.exists():
+                self.projection = Projection.load(self._projection_path)
+            return
+        with open(self._table_path, "r", encoding="utf-8") as f:
+            self._table_bytes = os.fstat(f.fileno()).st_size
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # partial last line from an interrupted write
+                record = json.loads(line)
+                if "dim" in record:
+                    self.dim = record["dim"]
+                    self.generation = record["generation"]
+                    self.dtype = record.get("dtype", "float32")
+                    if self._projection_path.exists():
+                        self.projection = Projection.load(self._projection_path)
+                elif "delete" in record:
+                    self._forget(record["delete"])
+                elif "replace" in record:
+                    self._forget(record["replace"])
+                    for row in record["rows"]:
+                        self._remember(row["id"], row["document"], row["metadata"])
+                else:
+                    self._remember(
+                        record["id"], record.get("document"), record.get("metadata")
+                    )
+
+        if self._vectors_path.exists():
+            # mapped read-only: a process that only searches never writes to them, and
+            # `_reserve` reopens them for writing when one does
+            self._vectors = np.load(self._vectors_path, mmap_mode="r")
+        if self.dtype != "float32" and self.count:
+            self._load_codes()
+        live = np.zeros(self.count, dtype=bool)
+        live[list(self.rows.values())] = True
+        self.live = live
+
+        self.ann = None
+        if self._ann_path.exists():
+            self.ann = IVFIndex.load(self._ann_path)
+            # rows added since the index was last saved
+            new = np.arange(self.ann.count, self.count)
+            self.ann.add(new, self.vectors()[self.ann.count :])
+
+        self.lexical = LexicalIndex()
+        if self._lexical_path.exists():
+            self.lexical = LexicalIndex.load(self._lexical_path)
+        start = self.lexical.count
+        self.lexical.add(range(start, self.count), self.documents[start:])
+        self.filters = MetadataIndex()
+        self.filters.add(range(self.count), self.metadatas)
+
+    def _project(self, vectors: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        # embeddings straight from the model are reduced, ones that already are pass
+        if self.projection is not None and vectors.shape[1] == self.projection.input_dim:
+            return self.projection.apply(vectors)
+        return vectors
+
+    def _load_codes(self) -> None:
+        if self._codes_path.exists():
+            self._codes = np.load(self._codes_path, mmap_mode="r")
+        if self.dtype == "int8" and self._scales_path.exists():
+            self._scales = np.load(self._scales_path, mmap_mode="r")
+        complete = self._codes is not None and len(self._codes) >= self.count
+        if self.dtype == "int8":
+            complete = complete and self._scales is not None
+            complete = complete and len(self._scales) >= self.count  # type: ignore[arg-type]
+        if not complete:
+            # missing or short (an interrupted write), and derived from the vectors anyway
+            self._codes = self._scales = None
+            self._reserve(self.count)
+            self._write_codes(0, np.asarray(self.vectors()))
+
+    def _remember(
+        self, id: str, document: str | None, metadata: dict[str, Any] | None
+    ) -> int:
+        row = self.count
+        if id in self.rows:
+            self._forget([id])
+        self.rows[id] = row
+        self.ids.append(id)
+        self.documents.append(document)
+        self.metadatas.append(metadata)
+        self.count += 1
+        return row
+
+    def _forget(self, ids: Sequence[str]) -> list[int]:
+        forgotten = []
+        for id in ids:
+            row = self.rows.pop(id, None)
+            if row is None:
+                continue
+            self.ids[row] = None
+            self.documents[row] = None
+            self.metadatas[row] = None
+            forgotten.append(row)
+        return forgotten
+
+    def _append_table(self, records: list[dict[str, Any]]) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self._table_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, default=str) + "\n" for r in records))
+            self._table_bytes = f.tell()
+
+    @property
+    def version(self) -> tuple[int, int]:
+        """
+        Changes whenever the store does: every change is appended to the table, and
+        `compact` starts a new generation.
+        """
+        return self.generation, self._table_bytes
+
+    def is_stale(self) -> bool:
+        """
+        True if another process (the indexer, say) has changed the store on disk since it
+        was loaded.
+        """
+        try:
+            size = self._table_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        return size != self._table_bytes or self._generation_changed()
+
+    def refresh(self) -> bool:
+        """
+        Reload if the store is stale. Returns True if it was reloaded.
+        """
+        if not self.is_stale():
+            return False
+        self._reset()
+        self.load()
+        return True
+
+    def _generation_changed(self) -> bool:
+        # compact replaces the table, which can leave it the same size
+        if not self._table_path.exists():
+            return False
+        with open(self._table_path, "r", encoding="utf-8") as f:
+            first = f.readline()
+        if not first.endswith("\n"):
+            return False
+        return json.loads(first).get("generation", self.generation) != self.generation
+
+    def _grow(
+        self,
+        path: Path,
+        mapped: np.memmap | None,
+        n_rows: int,
+        dtype: npt.DTypeLike,
+        shape: tuple[int, ...],
+    ) -> np.memmap:
+        if mapped is not None and len(mapped) >= n_rows:
+            if mapped.mode == "r+":
+                return mapped
+            return np.load(path, mmap_mode="r+")  # read-only, from `load`
+
+        capacity = INITIAL_CAPACITY
+        while capacity < n_rows:
+            capacity *= 2
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=dtype, shape=(capacity, *shape)
+        )
+        if mapped is not None:
+            grown[: self.count] = mapped[: self.count]
+        grown.flush()
+        del grown
+        os.replace(tmp, path)
+        return np.load(path, mmap_mode="r+")
+
+    def _reserve(self, n_rows: int) -> np.memmap:
+        """
+        Make sure the vectors file (and the quantized copy) has room for `n_rows`,
+        doubling its size when it doesn't. Returns the writable map of the vectors.
+        """
+        assert self.dim is not None
+        self._vectors = self._grow(
+            self._vectors_path, self._vectors, n_rows, np.float32, (self.dim,)
+        )
+        if self.dtype != "float32":
+            self._codes = self._grow(
+                self._codes_path, self._codes, n_rows, self.dtype, (self.dim,)
+            )
+        if self.dtype == "int8":
+            self._scales = self._grow(
+                self._scales_path, self._scales, n_rows, np.float32, ()
+            )
+        return self._vectors
+
+    def _write_codes(self, start: int, vectors: npt.NDArray[np.float32]) -> None:
+        if self.dtype == "float32":
+            return
+        assert self._codes is not None
+        codes, scales = quantize(vectors, self.dtype)
+        self._codes[start : start + len(codes)] = codes
+        self._codes.flush()
+        if scales is not None:
+            assert self._scales is not None
+            self._scales[start : start + len(scales)] = scales
+            self._scales.flush()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, id: object) -> bool:
+        return id in self.rows
+
+    def add(
+        self,
+        ids: Sequence[str],
+        embeddings: npt.ArrayLike,
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict[str, Any]] | None = None,
+    ) -> None:
+        """
+        Add rows. An id that already exists replaces the old row.
+        """
+        self._add(ids, embeddings, documents, metadatas)
+
+    def _add(
+        self,
+        ids: Sequence[str],
+        embeddings: npt.ArrayLike,
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict[str, Any]] | None = None,
+        delete: Sequence[str] = (),
+    ) -> None:
+        if len(ids) == 0:
+            # no embeddings to check (an empty list doesn't even have a dimension)
+            if delete:
+                self.delete(delete)
+            return
+        vectors = self._project(normalize(embeddings))
+        if len(vectors) != len(ids):
+            raise ValueError(f"Got {len(ids)} ids but {len(vectors)} embeddings")
+
+        records: list[dict[str, Any]] = []
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            records.append(
+                {"dim": self.dim, "generation": self.generation, "dtype": self.dtype}
+            )
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"Expected {self.dim} dimensional embeddings, got {vectors.shape[1]}"
+            )
+
+        # vectors go in before the table rows that point at them
+        start = self.count
+        mapped = self._reserve(start + len(ids))
+        mapped[start : start + len(ids)] = vectors
+        mapped.flush()
+        self._write_codes(start, vectors)
+
+        live = np.zeros(start + len(ids), dtype=bool)
+        live[:start] = self.live
+        rows: list[dict[str, Any]] = []
+        for i, id in enumerate(ids):
+            document = documents[i] if documents is not None else None
+            metadata = metadatas[i] if metadatas is not None else None
+            replaced = self.rows.get(id)
+            if replaced is not None:
+                live[replaced] = False
+            live[self._remember(id, document, metadata)] = True
+            rows.append({"id": id, "document": document, "metadata": metadata})
+        new = set(ids)
+        delete = [id for id in delete if id not in new]
+        deleted = self._forget(delete)
+        live[deleted] = False
+        self.live = live
+        if deleted:
+            self.lexical.invalidate()
+            # one line, so a reader loading the table sees all of it or none of it
+            records.append({"replace": delete, "rows": rows})
+        else:
+            records.extend(rows)
+        self._append_table(records)
+        if self.ann is not None:
+            self.ann.add(np.arange(start, start + len(ids)), vectors)
+        self.lexical.add(
+            range(start, start + len(ids)),
+            documents if documents is not None else [None] * len(ids),
+        )
+        self.filters.add(
+            range(start, start + len(ids)),
+            metadatas if metadatas is not None else [None] * len(ids),
+        )
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: npt.ArrayLike,
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict[str, Any]] | None = None,
+    ) -> None:
+        """
+        `add` already replaces existing ids; this is the name Chroma uses for it.
+        """
+        self.add(ids, embeddings, documents, metadatas)
+
+    def replace(
+        self,
+        delete: Sequence[str],
+        ids: Sequence[str],
+        embeddings: npt.ArrayLike,
+        documents: Sequence[str] | None = None,
+        metadatas: Sequence[dict[str, Any]] | None = None,
+    ) -> None:
+        """
+        Delete the `delete` ids and add the new rows in one step: a process loading the
+        table (a query service refreshing, say) either sees the old rows or the new
+        ones, never a post with its old sections gone and the new ones not there yet.
+        """
+        self._add(ids, embeddings, documents, metadatas, delete=delete)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        rows = self._forget(ids)
+        if not rows:
+            return
+        self.live[rows] = False
+        self.lexical.invalidate()
+        self._append_table([{"delete": list(ids)}])
+
+    def get(self, ids: Sequence[str] | None = None) -> dict[str, list[Any]]:
+        """
+        Look up rows by id (or every live row), in the same shape Chroma returns.
+        """
+        if ids is None:
+            rows = [int(row) for row in np.flatnonzero(self.live)]
+        else:
+            rows = [self.rows[id] for id in ids if id in self.rows]
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self.documents[row] for row in rows],
+            "metadatas": [self.metadatas[row] for row in rows],
+        }
+
+    def vectors(self) -> npt.NDArray[np.float32]:
+        """
+        The mapped vectors, including dead rows (see `live`).
+        """
+        if self._vectors is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._vectors[: self.count]
+
+    def nbytes(self) -> int:
+        """
+        The size of the vectors that queries scan: the quantized copy if there is one.
+        """
+        if self.dtype == "float32":
+            return self.vectors().nbytes
+        assert self._codes is not None
+        size = self._codes[: self.count].nbytes
+        if self._scales is not None:
+            size += self._scales[: self.count].nbytes
+        return size
+
+    def scores(
+        self,
+        queries: npt.NDArray[np.float32],
+        rows: npt.NDArray[np.int64] | None = None,
+    ) -> npt.NDArray[np.float32]:
+        """
+        Similarity of each (normalized) query to each of `rows`, or to every row. A
+        quantized store is scored from its quantized copy, a block of rows at a time.
+        """
+        if self.dtype == "float32":
+            vectors = self.vectors()
+            return queries @ (vectors if rows is None else vectors[rows]).T
+
+        assert self._codes is not None
+        n = self.count if rows is None else len(rows)
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK):
+            stop = min(start + SCORE_BLOCK, n)
+            index = slice(start, stop) if rows is None else rows[start:stop]
+            block = queries @ self._codes[index].astype(np.float32).T
+            if self._scales is not None:
+                block *= self._scales[index]
+            scores[:, start:stop] = block
+        return scores
+
+    def _best(
+        self,
+        query: npt.NDArray[np.float32],
+        rows: npt.NDArray[np.int64],
+        scores: npt.NDArray[np.float32],
+        k: int,
+        rerank: int,
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]:
+        """
+        The best `k` of the candidate `rows`. With `rerank`, that many are taken by their
+        (quantized) `scores`, then rescored from the float32 vectors.
+
+        Rows scored `-inf` (deleted, or not matching a filter) are never returned.
+        """
+        if self.dtype == "float32" or rerank <= k:
+            top, top_scores = top_k(scores, min(k, len(rows)))
+            found = np.isfinite(top_scores)
+            return rows[top[found]], top_scores[found]
+        top, top_scores = top_k(scores, min(rerank, len(rows)))
+        # the rerank takes more candidates than there may be rows that qualify
+        top = top[np.isfinite(top_scores)]
+        candidates = np.sort(rows[top])  # sequential reads from the memory map
+        exact = self.vectors()[candidates] @ query
+        top, top_scores = top_k(exact, min(k, len(candidates)))
+        return candidates[top], top_scores
+
+    def _sharded(self) -> bool:
+        return self.scorer is not None and self.count >= self.scorer.min_rows
+
+    def build_ann(self, n_lists: int | None = None, save: bool = True) -> IVFIndex:
+        """
+        Train an IVF index on the live rows and (unless `save=False`) save it next to the
+        vectors.
+        """
+        rows = np.flatnonzero(self.live)
+        if len(rows) == 0:
+            raise ValueError("Can't build an index for an empty store")
+        vectors = self.vectors()
+        ann = IVFIndex.train(vectors[rows], n_lists=n_lists)
+        ann.add(rows, vectors[rows])
+        ann.count = self.count
+        if save:
+            ann.save(self._ann_path)
+        self.ann = ann
+        return ann
+
+    def save_indexes(self) -> None:
+        if self.ann is not None:
+            self.ann.save(self._ann_path)
+        self.lexical.save(self._lexical_path)
+
+    def matching(self, where: dict[str, Any] | None) -> npt.NDArray[np.bool_]:
+        """
+        The live rows that match a `where` filter (see `filters.py`), as a mask.
+        """
+        if where is None:
+            return self.live
+        return self.live & self.filters.mask(where, self.count)
+
+    def _gather(
+        self,
+        queries: npt.NDArray[np.float32],
+        rows: npt.NDArray[np.int64],
+        k: int,
+        rerank: int,
+    ) -> list[tuple[npt.NDArray[np.int64], npt.NDArray[np.float32]]]:
+        scores = self.scores(queries, rows)
+        return [
+            self._best(query, rows, row_scores, k, rerank)
+            for query, row_scores in zip(queries, scores)
+        ]
+
+    def candidates(
+        self, query: npt.NDArray[np.float32], nprobe: int | None = None
+    ) -> npt.NDArray[np.int64]:
+        """
+        The live rows in the IVF clusters closest to a query.
+        """
+        assert self.ann is not None
+        rows = self.ann.candidates(query, nprobe or self.nprobe)
+        return rows[self.live[rows]]
+
+    def query(
+        self,
+        query_embeddings: npt.ArrayLike,
+        n_results: int = 10,
+        nprobe: int | None = None,
+        exact: bool = False,
+        rerank: int | None = None,
+        where: dict[str, Any] | None = None,
+    ) -> dict[str, list[list[Any]]]:
+        """
+        Top `n_results` rows by cosine similarity for each query embedding. Distances are
+        `1 - cosine`, like a Chroma collection using the cosine space.
+
+        If an IVF index has been built it's used unless `exact=True`; `nprobe` overrides
+        the store's default number of clusters to search. `rerank` overrides the store's
+        default for a quantized store.
+
+        `where` only returns rows whose metadata matches it, e.g. `{"tags": "alchemy"}`.
+        The filter is applied before the top k are chosen: a selective one scores only
+        the rows it matches (and skips the IVF index, whose clusters might hold none of
+        them), a broad one masks the others out of the scan.
+        """
+        queries = self._project(normalize(query_embeddings))
+        results: dict[str, list[list[Any]]] = {
+            "ids": [],
+            "distances": [],
+            "documents": [],
+            "metadatas": [],
+        }
+        live = self.matching(where)
+        n_live = len(self.rows) if where is None else int(np.count_nonzero(live))
+        k = min(n_results, n_live)
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        rerank = self.rerank if rerank is None else rerank
+        if where is not None and n_live <= max(FILTER_GATHER * self.count, k):
+            hits = self._gather(queries, np.flatnonzero(live), k, rerank)
+        elif (self.ann is None or exact) and self._sharded():
+            assert self.scorer is not None
+            # the shards return enough candidates for the rerank
+            n = k if self.dtype == "float32" else max(k, rerank)
+            shard_hits = self.scorer.top_k(
+                self, queries, n, live if where is not None else None
+            )
+            hits = [
+                self._best(query, rows, row_scores, k, rerank)
+                for query, (rows, row_scores) in zip(queries, shard_hits)
+            ]
+        elif self.ann is None or exact:
+            scores = self.scores(queries)
+            scores[:, ~live] = -np.inf
+            every = np.arange(self.count)
+            hits = [
+                self._best(query, every, row_scores, k, rerank)
+                for query, row_scores in zip(queries, scores)
+            ]
+        else:
+            hits = []
+            for query in queries:
+                rows = self.candidates(query, nprobe)
+                if where is not None:
+                    rows = rows[live[rows]]
+                    if len(rows) < k:
+                        # the closest clusters don't have enough rows that match
+                        hits.extend(
+                            self._gather(
+                                query[np.newaxis], np.flatnonzero(live), k, rerank
+                            )
+                        )
+                        continue
+                rows.sort()  # sequential reads from the memory map
+                row_scores = self.scores(query[np.newaxis], rows)[0]
+                hits.append(self._best(query, rows, row_scores, k, rerank))
+
+        for rows, row_scores in hits:
+            results["ids"].append([self.ids[row] for row in rows])
+            results["distances"].append([float(1.0 - score) for score in row_scores])
+            results["documents"].append([self.documents[row] for row in rows])
+            results["metadatas"].append([self.metadatas[row] for row in rows])
+        return results
+
+    def compact(self) -> None:
+        """
+        Rewrite the vectors and table without the deleted rows.
+        """
+        if self.dim is None or len(self.rows) == self.count:
+            return
+        self._rewrite(np.flatnonzero(self.live))
+
+    def reduce(self, projection: Projection) -> None:
+        """
+        Project the stored vectors down to `projection.dim` dimensions, dropping deleted
+        rows on the way. Embeddings added and queries run afterwards are projected too.
+        An IVF index is retrained for the new vectors.
+
+        >>> store.reduce(Projection.pca(store.vectors()[store.live], dim=256))
+        """
+        if self.projection is not None:
+            raise ValueError(
+                f"{self.dir} is already reduced to {self.dim} dimensions; re-index into "
+                "a new store to change it"
+            )
+        if self.dim is None:
+            # nothing stored yet, the first rows will be projected as they're added
+            self.dir.mkdir(parents=True, exist_ok=True)
+            projection.save(self._projection_path)
+            self.projection = projection
+            return
+        if self.dim != projection.input_dim:
+            raise ValueError(
+                f"Expected a projection from {self.dim} dimensions, "
+                f"got one from {projection.input_dim}"
+            )
+        self._rewrite(np.flatnonzero(self.live), projection)
+
+    def _rewrite(
+        self, keep: npt.NDArray[np.int64], projection: Projection | None = None
+    ) -> None:
+        """
+        Write a new generation of the store with only the `keep` rows, projected if a
+        projection is given.
+        """
+        old_paths = [
+            self._vectors_path,
+            self._codes_path,
+            self._scales_path,
+            self._ann_path,
+            self._lexical_path,
+            self._projection_path,
+        ]
+        vectors = np.ascontiguousarray(self.vectors()[keep])
+        if projection is not None:
+            vectors = projection.apply(vectors)
+        self.generation += 1
+        np.save(self._vectors_path, vectors)
+
+        if projection is not None and self.dtype != "float32":
+            codes, scales = quantize(vectors, self.dtype)
+            np.save(self._codes_path, codes)
+            if scales is not None:
+                np.save(self._scales_path, scales)
+        else:
+            if self._codes is not None:
+                np.save(self._codes_path, np.ascontiguousarray(self._codes[keep]))
+            if self._scales is not None:
+                np.save(self._scales_path, np.ascontiguousarray(self._scales[keep]))
+
+        if self.ann is not None:
+            if projection is None:
+                self.ann.remap(keep)
+            else:
+                # the old centroids are in the old space
+                n_lists = self.ann.n_lists
+                self.ann = IVFIndex.train(vectors, n_lists=n_lists)
+                self.ann.add(np.arange(len(keep)), vectors)
+                self.ann.count = len(keep)
+            self.ann.save(self._ann_path)
+        self.lexical.remap(keep)
+        self.lexical.save(self._lexical_path)
+        projection = projection or self.projection
+        if projection is not None:
+            projection.save(self._projection_path)
+
+        tmp_table = self._table_path.with_suffix(".tmp")
+        with open(tmp_table, "w", encoding="utf-8") as f:
+            header = {
+                "dim": int(vectors.shape[1]),
+                "generation": self.generation,
+                "dtype": self.dtype,
+            }
+            f.write(json.dumps(header) + "\n")
+            for row in keep:
+                record = {
+                    "id": self.ids[row],
+                    "document": self.documents[row],
+                    "metadata": self.metadatas[row],
+                }
+                f.write(json.dumps(record, default=str) + "\n")
+        # this is the switch-over: until the table is replaced, the old files are intact
+        os.replace(tmp_table, self._table_path)
+
+        self._vectors = self._codes = self._scales = None
+        for path in old_paths:
+            path.unlink(missing_ok=True)
+        self._reset()
+        self.load()
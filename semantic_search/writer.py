@@ -0,0 +1,154 @@
+"""
+Write large numbers of chunks to a collection, in batches, without duplicating anything
+on a re-run.
+
+A chunk's id is its post's path and its position in the post (`notes/bacon.md#3`), and
+its position (as `chunk`) and the hash of its text are stored in its metadata. Before a
+batch is embedded the writer looks its ids up: chunks that are already there with the
+same hash are skipped, the rest are upserted, replacing whatever had the id before.
+While one batch is being written the next one is being embedded.
+
+Those ids are positional, unlike the `IncrementalIndexer`'s, which are built from each
+section's headings and text (`postindexer.section_ids`), so the two mustn't write to the
+same store or collection: each would see the other's chunks as stale ones to replace or
+leave behind.
+
+>>> writer = BulkWriter(search.store, embed=search.embed_sections)
+>>> writer.write(Chunk(rel, i, section_text(s), {"title": title}) for i, s in ...)
+{'written': 1400, 'skipped': 0, 'batches': 6}
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+from metrics import count, timer
+from .embedding_cache import text_key
+
+__all__ = ["BulkWriter", "Chunk", "chunk_id"]
+
+
+class Chunk(NamedTuple):
+    path: str
+    index: int
+    text: str
+    metadata: dict[str, Any] = {}
+
+
+def chunk_id(path: str, index: int) -> str:
+    return f"{path}#{index}"
+
+
+# (ids, documents, metadatas) of the chunks in a batch that need writing
+Batch = tuple[list[str], list[str], list[dict[str, Any]]]
+
+
+class BulkWriter(object):
+    """
+    `collection` is a `VectorStore` or a Chroma collection: anything with `get(ids=)`
+    and `upsert(ids=, documents=, metadatas=, embeddings=)`. Without `embed` the
+    collection's embedding function is used.
+
+    `batch_size` is the number of chunks per write. Larger batches amortize the per-call
+    overhead (an HTTP request for a Chroma server), smaller ones keep the embedding and
+    writing overlapped at the start and end of a run.
+    """
+
+    def __init__(
+        self,
+        collection: Any,
+        embed: Callable[[list[str]], Any] | None = None,
+        batch_size: int = 256,
+    ) -> None:
+        self.collection = collection
+        self.embed = embed
+        self.batch_size = max(batch_size, 1)
+
+    def _batches(self, chunks: Iterable[Chunk]) -> Iterator[list[Chunk]]:
+        batch: list[Chunk] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _changed(self, chunks: list[Chunk]) -> Batch:
+        """
+        The chunks that aren't already in the collection with the same text.
+        """
+        ids = [chunk_id(chunk.path, chunk.index) for chunk in chunks]
+        with timer("writer.lookup"):
+            existing = self.collection.get(ids=ids)
+        stored = {
+            id: (metadata or {}).get("hash")
+            for id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+        batch: Batch = ([], [], [])
+        for id, chunk in zip(ids, chunks):
+            digest = text_key(chunk.text)
+            if stored.get(id) == digest:
+                continue
+            metadata = dict(chunk.metadata)
+            # not "section", which is the post's Hugo section in the indexer's metadata
+            # (and a filterable field)
+            metadata.update(path=chunk.path, chunk=chunk.index, hash=digest)
+            batch[0].append(id)
+            batch[1].append(chunk.text)
+            batch[2].append(metadata)
+        return batch
+
+    def _upsert(self, batch: Batch, embeddings: Any) -> None:
+        ids, documents, metadatas = batch
+        with timer("writer.upsert"):
+            if embeddings is None:
+                self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+            else:
+                self.collection.upsert(
+                    ids=ids,
+                    documents=documents,
+                    metadatas=metadatas,
+                    embeddings=embeddings,
+                )
+
+    def _embed(self, batch: Batch) -> Any:
+        if self.embed is None:
+            return None
+        with timer("writer.embed"):
+            return self.embed(batch[1])
+
+    def write(self, chunks: Iterable[Chunk]) -> dict[str, int]:
+        """
+        Upsert new and changed chunks. Returns counts of the chunks written and skipped,
+        and of the batches that were written.
+        """
+        stats = {"written": 0, "skipped": 0, "batches": 0}
+        # embedded, waiting for the previous write to finish
+        ready: tuple[Batch, Any] | None = None
+        writing: Future[None] | None = None
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for chunks_batch in self._batches(chunks):
+                # looked up before the previous batch's write starts, so the collection
+                # is never read and written from two threads at once
+                batch = self._changed(chunks_batch)
+                stats["skipped"] += len(chunks_batch) - len(batch[0])
+                if ready is not None:
+                    writing = executor.submit(self._upsert, *ready)
+                    ready = None
+                if batch[0]:
+                    ready = (batch, self._embed(batch))
+                    stats["written"] += len(batch[0])
+                    stats["batches"] += 1
+                if writing is not None:
+                    writing.result()
+                    writing = None
+            if ready is not None:
+                self._upsert(*ready)
+
+        count("writer.written", stats["written"])
+        count("writer.skipped", stats["skipped"])
+        return stats